@@ -0,0 +1,38 @@
+"""Html pages for the benchmarks: synthetic news articles or a folder of saved ones."""
+
+import random
+from pathlib import Path
+
+
+WORDS = (
+    "council tram city budget election minister school police weather market "
+    "football season club player hospital railway village festival energy price"
+).split()
+# newspaper scores paragraphs by their stopwords, pages without any come out empty
+STOPWORDS = "the of and to in a is that for on with as was at by".split()
+
+
+def synthetic_page(seed: int, paragraphs: int = 30) -> bytes:
+    rnd = random.Random(seed)
+
+    def sentence() -> str:
+        words = (rnd.choice(WORDS if i % 2 else STOPWORDS) for i in range(rnd.randint(8, 20)))
+        return " ".join(words).capitalize() + "."
+
+    body = "\n".join(f"<p>{' '.join(sentence() for _ in range(4))}</p>" for _ in range(paragraphs))
+    nav = "".join(f'<li><a href="/s/{i}">{sentence()}</a></li>' for i in range(40))
+    return (
+        f"<html><head><title>{sentence()}</title>"
+        '<meta name="author" content="Jane Doe"></head><body>'
+        f"<nav><ul>{nav}</ul></nav><article><h1>{sentence()}</h1>{body}</article>"
+        "<footer>Impressum</footer></body></html>"
+    ).encode("utf-8")
+
+
+def load_corpus(corpus: str | None, pages: int) -> list[bytes]:
+    if corpus is None:
+        return [synthetic_page(i) for i in range(pages)]
+    files = sorted(Path(corpus).glob("*.html"))
+    if not files:
+        raise SystemExit(f"no .html files in {corpus}")
+    return [files[i % len(files)].read_bytes() for i in range(pages)]
@@ -0,0 +1,240 @@
+"""
+Local stand-ins for the services the pipeline and the web app talk to,
+each a threaded HTTP server on a free port of 127.0.0.1:
+
+- publishers: robots.txt and article pages from an html corpus
+- cse: Custom Search JSON with links to the publisher pages
+- openai: /v1/chat/completions, answering topic and summary prompts
+- s3: GetObject for any key, a generated PNG per key
+
+Latencies are slept in the handler thread, so concurrent requests
+overlap the way they would against the real services.
+"""
+
+import hashlib
+import io
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.corpus import WORDS
+
+PAGES_PER_QUERY = 10
+
+
+@dataclass
+class Settings:
+    corpus: list[bytes]
+    publisher_latency: float = 0.05
+    cse_latency: float = 0.1
+    llm_latency: float = 0.5
+    s3_latency: float = 0.02
+    summary_words: int = 250
+    topic_size: int = 5
+    image_size: tuple[int, int] = (800, 600)
+    requests: dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def count(self, service: str) -> None:
+        with self._lock:
+            self.requests[service] = self.requests.get(service, 0) + 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings: Settings
+    service = ""
+    latency: Callable[[Settings], float] = staticmethod(lambda settings: 0.0)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def reply(self, status: int, body: bytes, content_type: str, **headers: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name.replace("_", "-"), value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def reply_json(self, payload: object, status: int = 200) -> None:
+        self.reply(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def handle_one_request(self) -> None:
+        # Count and delay real requests only, not the final read of a closed connection
+        self.raw_requestline = self.rfile.readline(65537)
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if not self.parse_request():
+            return
+        self.settings.count(self.service)
+        time.sleep(self.latency(self.settings))
+        handler = getattr(self, f"do_{self.command}", None)
+        if handler is None:
+            self.send_error(405)
+            return
+        handler()
+        self.wfile.flush()
+
+
+class PublisherHandler(Handler):
+    service = "publisher"
+    latency = staticmethod(lambda settings: settings.publisher_latency)
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == "/robots.txt":
+            self.reply(200, b"User-agent: *\nAllow: /\n", "text/plain")
+            return
+        match = re.fullmatch(r"/news/(\d+)\.html", path)
+        if match is None:
+            self.reply(404, b"not found", "text/plain")
+            return
+        corpus = self.settings.corpus
+        self.reply(200, corpus[int(match[1]) % len(corpus)], "text/html; charset=utf-8")
+
+
+def headline(seed: str) -> str:
+    rnd = random.Random(seed)
+    return " ".join(rnd.choice(WORDS) for _ in range(10)).capitalize()
+
+
+class CSEHandler(Handler):
+    service = "cse"
+    latency = staticmethod(lambda settings: settings.cse_latency)
+    publisher_url = ""
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlsplit(self.path).query).get("q", [""])[0]
+        # Stable page numbers per query, so a query always finds the same pages
+        base = int(hashlib.sha256(query.encode("utf-8")).hexdigest()[:8], 16) * PAGES_PER_QUERY
+        items = [
+            {
+                "link": f"{self.publisher_url}/news/{base + i}.html",
+                "title": headline(f"{query}/{i}"),
+                "snippet": headline(f"{query}/{i}/snippet"),
+                "displayLink": urlsplit(self.publisher_url).netloc,
+            }
+            for i in range(PAGES_PER_QUERY)
+        ]
+        self.reply_json({"items": items})
+
+
+class OpenAIHandler(Handler):
+    service = "openai"
+    latency = staticmethod(lambda settings: settings.llm_latency)
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = request["messages"][-1]["content"]
+        content = self.answer(request["messages"][0]["content"], prompt)
+        self.reply_json(
+            {
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "benchmark"),
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 0, "total_tokens": 0},
+            }
+        )
+
+    def answer(self, system: str, prompt: str) -> str:
+        size = self.settings.topic_size
+        if "cluster pages" in system:
+            # ai.generate_topics: consecutive pages form a topic
+            ids = [page["id"] for page in json.loads(prompt.split("pages: ", 1)[1])]
+            groups = [ids[i : i + size] for i in range(0, len(ids), size)]
+            return json.dumps(
+                [{"topic": f"topic {g[0]}", "importance": 10 - n % 10, "ids": g} for n, g in enumerate(groups)]
+            )
+        if "name clusters" in system:
+            # ai.generate_topics_local
+            clusters = json.loads(prompt.split("clusters: ", 1)[1])
+            return json.dumps([{"id": c["id"], "topic": f"cluster {c['id']}", "importance": 5} for c in clusters])
+        rnd = random.Random(prompt)
+        return " ".join(rnd.choice(WORDS) for _ in range(self.settings.summary_words)).capitalize() + "."
+
+
+@lru_cache(maxsize=4)
+def base_png(size: tuple[int, int]) -> bytes:
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(out, format="PNG")
+    return out.getvalue()
+
+
+def png(key: str, size: tuple[int, int]) -> bytes:
+    """The base image with the key in a text chunk, so every key has its own bytes and ETag."""
+    base = base_png(size)
+    data = b"key\0" + key.encode("utf-8")
+    chunk = struct.pack(">I", len(data)) + b"tEXt" + data + struct.pack(">I", zlib.crc32(b"tEXt" + data))
+    # IEND is the last 12 bytes
+    return base[:-12] + chunk + base[-12:]
+
+
+class S3Handler(Handler):
+    """Path style GetObject: /<bucket>/<key>."""
+
+    service = "s3"
+    latency = staticmethod(lambda settings: settings.s3_latency)
+
+    def do_GET(self) -> None:
+        bucket_and_key = urlsplit(self.path).path.lstrip("/")
+        if "/" not in bucket_and_key:
+            self.reply(404, b"<Error><Code>NoSuchKey</Code></Error>", "application/xml")
+            return
+        data = png(bucket_and_key, self.settings.image_size)
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self.reply(200, data, "image/png", ETag=etag)
+
+
+@dataclass
+class Services:
+    settings: Settings
+    servers: dict[str, ThreadingHTTPServer]
+
+    def url(self, service: str) -> str:
+        host, port = self.servers[service].server_address[:2]
+        return f"http://{host}:{port}"
+
+    def close(self) -> None:
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def _serve(handler: type[Handler], settings: Settings, **attrs: str) -> ThreadingHTTPServer:
+    handler_class = type(handler.__name__, (handler,), {"settings": settings, **attrs})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start(settings: Settings) -> Services:
+    """Start all stand-ins; call close() on the result when done."""
+    publishers = _serve(PublisherHandler, settings)
+    host, port = publishers.server_address[:2]
+    servers = {
+        "publisher": publishers,
+        "cse": _serve(CSEHandler, settings, publisher_url=f"http://{host}:{port}"),
+        "openai": _serve(OpenAIHandler, settings),
+        "s3": _serve(S3Handler, settings),
+    }
+    return Services(settings, servers)
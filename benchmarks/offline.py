@@ -0,0 +1,308 @@
+"""
+Offline benchmark of scrape_news, /hx/news-feed and /image/{key} against
+local stand-ins for Custom Search, OpenAI, S3 and the publishers (see
+benchmarks.fakes), on a throwaway SQLite database.
+
+    python -m benchmarks.offline                        # defaults, a few minutes at most
+    python -m benchmarks.offline --runs 5 --queries 4 --llm-latency 1.0
+    python -m benchmarks.offline --corpus pages/ --json baseline.json
+
+Reports throughput, p50/p95 latency and peak traced memory (tracemalloc,
+this process only: parser processes are not included) per pipeline stage
+and per endpoint scenario. Every scrape run uses new queries, so the
+search, article and LLM caches start cold each time.
+
+All publisher pages are served by one local host, so per-host pacing and
+the per-domain limit are lifted unless FETCH_RATE or EXTRACT_PER_DOMAIN
+are set.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from benchmarks import fakes
+from benchmarks.corpus import load_corpus
+
+# Stage of scrape_news -> the count in its progress entry that it produces
+STAGE_ITEMS = {
+    "search": "pages",
+    "topics": "topics",
+    "extract": "articles",
+    "summarise": "summaries",
+    "store": "news_items",
+}
+
+
+@dataclass(frozen=True)
+class Result:
+    name: str
+    samples: int
+    items: int
+    seconds: float
+    p50_ms: float
+    p95_ms: float
+    peak_mib: float | None
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+
+def result(name: str, latencies: list[float], items: int, seconds: float, peak: int | None) -> Result:
+    return Result(
+        name,
+        len(latencies),
+        items,
+        round(seconds, 3),
+        round(percentile(latencies, 0.5) * 1000, 1),
+        round(percentile(latencies, 0.95) * 1000, 1),
+        round(peak / 1024 / 1024, 1) if peak is not None else None,
+    )
+
+
+@contextmanager
+def traced_peak() -> Iterator[list[int | None]]:
+    """Peak traced memory of the block, in the one-element list yielded."""
+    peak: list[int | None] = [None]
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    yield peak
+    if tracing:
+        peak[0] = tracemalloc.get_traced_memory()[1]
+
+
+def configure(services: fakes.Services, workdir: str) -> None:
+    """Point dashbot at the stand-ins; runs before any dashbot module is imported."""
+    os.environ.update(
+        {
+            "GOOGLE_API_KEY": "benchmark",
+            "GOOGLE_CSE_ID": "benchmark",
+            "GOOGLE_CSE_URL": f"{services.url('cse')}/customsearch/v1",
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": f"{services.url('openai')}/v1",
+            "AWS_ENDPOINT_URL_S3": services.url("s3"),
+            "AWS_ACCESS_KEY_ID": "benchmark",
+            "AWS_SECRET_ACCESS_KEY": "benchmark",
+            "AWS_DEFAULT_REGION": "eu-central-1",
+            "DASHBOT_CACHE_PATH": os.path.join(workdir, "cache.sqlite3"),
+            "IMAGE_CACHE_DIR": os.path.join(workdir, "images"),
+            "LLM_REPLAY_MODE": "",
+        }
+    )
+    os.environ.setdefault("FETCH_RATE", "1000")
+    os.environ.setdefault("FETCH_BURST", "100")
+    os.environ.setdefault("EXTRACT_PER_DOMAIN", os.getenv("EXTRACT_CONCURRENCY", "16"))
+
+
+def open_database(path: str) -> None:
+    """Migrate a SQLite file and bind both session factories to it."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from dashbot.scripts import database, migrations
+
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.migrate(engine)
+    database.SessionLocal.configure(bind=engine)
+    database.AsyncSessionLocal.configure(bind=create_async_engine(f"sqlite+aiosqlite:///{path}"))
+
+
+async def bench_scrape(runs: int, queries: int) -> list[Result]:
+    """scrape_news end to end and per stage, `runs` times with fresh queries."""
+    from dashbot import pipeline
+    from dashbot.api import cse, http_client, llm
+
+    totals: list[float] = []
+    total_items = 0
+    total_peak = 0
+    stages: dict[str, dict[str, Any]] = {
+        name: {"latencies": [], "items": 0, "peak": None} for name in STAGE_ITEMS
+    }
+
+    class MeasuredProgress(pipeline.Progress):
+        @contextmanager
+        def stage(self, name: str) -> Iterator[dict[str, Any]]:
+            with traced_peak() as peak, super().stage(name) as entry:
+                yield entry
+            stats = stages[name]
+            stats["latencies"].append(entry["seconds"])
+            stats["items"] += entry.get(STAGE_ITEMS[name], 0)
+            if peak[0] is not None:
+                stats["peak"] = max(stats["peak"] or 0, peak[0])
+
+    # Parse the way the standalone worker does
+    cse.use_parse_processes()
+    async with http_client.session():
+        try:
+            for run in range(runs):
+                mapping = {f"benchmark {run}-{i}": "benchmark.png" for i in range(queries)}
+                start = time.perf_counter()
+                with traced_peak() as peak:
+                    outcome = await pipeline.scrape_news(mapping, force=True, progress=MeasuredProgress())
+                totals.append(time.perf_counter() - start)
+                total_items += len(outcome["news_feed_ids"])
+                total_peak = max(total_peak, peak[0] or 0)
+        finally:
+            await llm.close()
+            cse.close_parse_pool()
+
+    results = [
+        result("scrape_news", totals, total_items, sum(totals), total_peak if tracemalloc.is_tracing() else None)
+    ]
+    for name, stats in stages.items():
+        if stats["latencies"]:
+            results.append(
+                result(f"  {name}", stats["latencies"], stats["items"], sum(stats["latencies"]), stats["peak"])
+            )
+    return results
+
+
+async def seed_feed(items: int) -> None:
+    """Extra feed items, written the way the pipeline writes them."""
+    from dashbot import store
+
+    news = [
+        store.NewsItem(f"Seeded item {i}", "Seeded content. " * 40, "bench", f"seed-{i % 20}.png")
+        for i in range(items)
+    ]
+    await asyncio.to_thread(store.store_news, news, run_id="benchmark-seed")
+
+
+async def bench_requests(
+    name: str,
+    send: Callable[[int], Awaitable[Any]],
+    requests: int,
+    concurrency: int,
+) -> Result:
+    """`requests` calls of send(i), at most `concurrency` at a time."""
+    limit = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with limit:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name}: {response.status_code} for request {i}")
+
+    start = time.perf_counter()
+    with traced_peak() as peak:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    return result(name, latencies, requests, time.perf_counter() - start, peak[0])
+
+
+async def bench_web(requests: int, concurrency: int, cold_requests: int) -> list[Result]:
+    """The feed and image endpoints, in process through httpx's ASGI transport."""
+    import httpx
+
+    from dashbot import feed, main
+
+    webp = {"Accept": "image/webp,image/*"}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+
+        async def feed_page(i: int) -> httpx.Response:
+            return await client.get("/hx/news-feed")
+
+        async def feed_page_uncached(i: int) -> httpx.Response:
+            feed.bump_version()
+            return await client.get("/hx/news-feed")
+
+        scenarios: list[tuple[str, Callable[[int], Awaitable[Any]], int]] = [
+            ("/hx/news-feed", feed_page, requests),
+            ("/hx/news-feed uncached", feed_page_uncached, requests),
+            ("/image cold", lambda i: client.get(f"/image/cold-{i}.png"), cold_requests),
+            ("/image warm", lambda i: client.get(f"/image/seed-{i % 20}.png"), requests),
+            ("/image?w=100 cold", lambda i: client.get(f"/image/thumb-{i}.png?w=100", headers=webp), cold_requests),
+            ("/image?w=100 warm", lambda i: client.get(f"/image/seed-{i % 20}.png?w=100", headers=webp), requests),
+        ]
+        # Warm the seeded images and their variants once before timing
+        for i in range(20):
+            await client.get(f"/image/seed-{i}.png")
+            await client.get(f"/image/seed-{i}.png?w=100", headers=webp)
+        return [await bench_requests(name, send, n, concurrency) for name, send, n in scenarios]
+
+
+async def run(args: argparse.Namespace, workdir: str) -> list[Result]:
+    open_database(os.path.join(workdir, "benchmark.sqlite3"))
+    results = await bench_scrape(args.runs, args.queries)
+    await seed_feed(args.feed_items)
+    results += await bench_web(args.requests, args.concurrency, args.cold_requests)
+    return results
+
+
+def report(results: list[Result], requests: dict[str, int]) -> None:
+    print(f"{'scenario':<26} {'n':>5} {'items/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'peak MiB':>9}")
+    for r in results:
+        peak = f"{r.peak_mib:.1f}" if r.peak_mib is not None else "-"
+        print(f"{r.name:<26} {r.samples:>5} {r.throughput:>9.1f} {r.p50_ms:>9.1f} {r.p95_ms:>9.1f} {peak:>9}")
+    print("stub requests: " + ", ".join(f"{k} {v}" for k, v in sorted(requests.items())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="scrape_news runs")
+    parser.add_argument("--queries", type=int, default=3, help="search queries per run, 10 pages each")
+    parser.add_argument("--corpus", help="folder of .html files served as articles (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint scenario")
+    parser.add_argument("--cold-requests", type=int, default=40, help="requests per cold image scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent requests")
+    parser.add_argument("--feed-items", type=int, default=200, help="extra items in the feed")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--cse-latency", type=float, default=0.1)
+    parser.add_argument("--publisher-latency", type=float, default=0.05)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc, it slows allocation heavy code")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    settings = fakes.Settings(
+        corpus=load_corpus(args.corpus, 50),
+        publisher_latency=args.publisher_latency,
+        cse_latency=args.cse_latency,
+        llm_latency=args.llm_latency,
+        s3_latency=args.s3_latency,
+    )
+    services = fakes.start(settings)
+    try:
+        with tempfile.TemporaryDirectory(prefix="dashbot-benchmark-") as workdir:
+            configure(services, workdir)
+            if not args.no_memory:
+                tracemalloc.start()
+            results = asyncio.run(run(args, workdir))
+    finally:
+        services.close()
+
+    report(results, settings.requests)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "args": vars(args),
+                    "results": [asdict(r) | {"throughput": round(r.throughput, 2)} for r in results],
+                    "stub_requests": settings.requests,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
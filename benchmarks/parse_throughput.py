@@ -0,0 +1,64 @@
+"""
+Parse throughput of cse.parse_html by number of parser processes.
+
+    python -m benchmarks.parse_throughput                  # synthetic pages
+    python -m benchmarks.parse_throughput --corpus pages/  # a folder of .html files
+
+Workers 0 parses sequentially in this process, the PARSE_WORKERS=0 path.
+Pool start-up is excluded: every pool parses one page before timing.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.corpus import load_corpus
+from dashbot.api.cse import parse_html
+
+
+def _parse(html: bytes) -> int:
+    return len(parse_html("https://news.example/article", html, "utf-8")["content"])
+
+
+def run(workers: int, docs: list[bytes]) -> float:
+    """Pages parsed per second."""
+    if workers == 0:
+        _parse(docs[0])
+        start = time.perf_counter()
+        for html in docs:
+            _parse(html)
+        return len(docs) / (time.perf_counter() - start)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        list(pool.map(_parse, docs[:workers]))
+        start = time.perf_counter()
+        list(pool.map(_parse, docs, chunksize=4))
+        return len(docs) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--corpus", help="folder of .html files, synthetic pages otherwise")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({0, 1, 2, 4, cpus} | ({8} if cpus >= 8 else set())),
+    )
+    args = parser.parse_args()
+
+    docs = load_corpus(args.corpus, args.pages)
+    print(f"{len(docs)} pages, {sum(map(len, docs)) / len(docs) / 1024:.0f} KiB each, {cpus} cpus")
+    baseline = None
+    for workers in args.workers:
+        rate = run(workers, docs)
+        baseline = baseline or rate
+        print(f"workers={workers:<3} {rate:8.1f} pages/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
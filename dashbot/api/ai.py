@@ -1,13 +1,18 @@
-import os
 import json
-from typing import Any, cast
+import os
+import uuid
+from typing import Any
 from dataclasses import dataclass
-from openai import OpenAI
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
-from dashbot.api import cse
+from dashbot import store
+from dashbot.api import cluster, cse, llm
 from dashbot.config import logger
-from dashbot.scripts.database import NewsFeed, DATABASE_URL
+
+
+# "llm" lets the model cluster all pages, "local" clusters them with
+# generate_topics_local and only asks the model to name the clusters
+TOPIC_MODE = os.getenv("TOPIC_MODE", "llm")
+# Number of local clusters sent to the model for naming
+LOCAL_TOPICS_MAX = int(os.getenv("LOCAL_TOPICS_MAX", "20"))
 
 
 @dataclass(frozen=True)
@@ -17,16 +22,12 @@ class Topic:
     pages: list[int]
 
 
-def generate_topics(pages: list[cse.GoogleCSE]) -> list[Topic]:
+async def generate_topics(pages: list[cse.GoogleCSE]) -> list[Topic]:
     """
     Call ChatGpt API to figure out the topics based on the title
     and snippet of each page in pages. Marshall the result into
     a list of Topic.
     """
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not openai_api_key:
-        raise ValueError("OPENAI_API_KEY is not set")
-
     if not pages:
         return []
 
@@ -35,8 +36,6 @@ def generate_topics(pages: list[cse.GoogleCSE]) -> list[Topic]:
     ]
 
     # Ask the model for a structured list of topics with importance 1-10
-    client = OpenAI(api_key=openai_api_key)
-
     messages = [
         {
             "role": "system",
@@ -64,11 +63,7 @@ def generate_topics(pages: list[cse.GoogleCSE]) -> list[Topic]:
         },
     ]
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=cast(Any, messages),  # type: ignore[arg-type]
-    )
-    content = response.choices[0].message.content or "[]"
+    content = await llm.chat(messages) or "[]"
     print("inside generate_topics")
     print(f"Content: {content}")
     if not content:
@@ -80,13 +75,9 @@ def generate_topics(pages: list[cse.GoogleCSE]) -> list[Topic]:
     for item in topics_payload:
         try:
             topic_str = str(item.get("topic", "")).strip()
-            importance_val = int(item.get("importance", 1))
+            importance_val = _clamp_importance(item.get("importance", 1))
             if not topic_str:
                 continue
-            if importance_val < 1:
-                importance_val = 1
-            if importance_val > 10:
-                importance_val = 10
             ids_val = [int(id) for id in item.get("ids", [])]
             result.append(Topic(topic_str, importance_val, ids_val))
         except Exception:
@@ -96,6 +87,75 @@ def generate_topics(pages: list[cse.GoogleCSE]) -> list[Topic]:
     return result
 
 
+def _clamp_importance(value: Any) -> int:
+    return min(max(int(value), 1), 10)
+
+
+async def generate_topics_local(pages: list[cse.GoogleCSE]) -> list[Topic]:
+    """
+    Cluster pages locally on their title and snippet (hashed TF-IDF, see
+    dashbot.api.cluster) and only ask ChatGpt to name and rate the largest
+    clusters. The prompt grows with the number of clusters, not pages. If
+    the reply cannot be parsed, clusters keep their first title as label
+    and get an importance by size.
+    """
+    if not pages:
+        return []
+
+    vectors = cluster.vectorise([f"{p.title or ''} {p.snippet or ''}" for p in pages])
+    groups = cluster.cluster(vectors)[:LOCAL_TOPICS_MAX]
+    cluster_summaries = [
+        {"id": id, "titles": [pages[i].title for i in group[:3]], "pages": len(group)}
+        for id, group in enumerate(groups)
+    ]
+
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You name clusters of news pages as concise topics and rate each topic by importance. "
+                "Return strictly a JSON array."
+            ),
+        },
+        {
+            "role": "user",
+            "content": (
+                "Given these clusters (id, sample titles, number of pages), name and rate each one.\n"
+                "Rules:\n"
+                "- topic: a few words to one short sentence (e.g., 'american politics', 'ukraine war').\n"
+                "- importance: integer 1-10; 10 = major breaking news (e.g., head of state shot),\n"
+                "  7-9 = significant global/national developments, 4-6 = notable but routine updates,\n"
+                "  1-3 = minor or niche items.\n"
+                "- Consider recency and urgency from wording (e.g., 'breaking', 'shooting', 'earthquake', 'resignation').\n"
+                "Return EXACTLY this JSON shape and nothing else: \n"
+                '[{"id": 0, "topic": "text", "importance": 1}]\n\n'
+                f"clusters: {json.dumps(cluster_summaries, ensure_ascii=False)}"
+            ),
+        },
+    ]
+
+    content = await llm.chat(messages)
+    named: dict[int, dict[str, Any]] = {}
+    try:
+        payload = json.loads(content.strip().removeprefix("```json").strip("`\n "))
+        for item in payload:
+            named[int(item["id"])] = item
+    except (ValueError, TypeError, KeyError):
+        logger.error("failed to parse cluster names, falling back to page titles")
+
+    result: list[Topic] = []
+    for id, group in enumerate(groups):
+        item = named.get(id, {})
+        topic_str = str(item.get("topic") or pages[group[0]].title or "").strip()
+        try:
+            importance_val = _clamp_importance(item.get("importance", len(group)))
+        except (ValueError, TypeError):
+            importance_val = _clamp_importance(len(group))
+        if topic_str:
+            result.append(Topic(topic_str, importance_val, group))
+    return result
+
+
 def personalize_topics(topics: list[Topic]) -> list[Topic]:
     """Return top 5 topics by importance"""
     return sorted(topics, key=lambda x: x.importance, reverse=True)[:5]
@@ -112,12 +172,7 @@ def get_pages_per_topic(
     return result
 
 
-def generate_summary(context: str) -> str:
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=openai_api_key)
-    if not openai_api_key:
-        raise ValueError("OPENAI_API_KEY is not set")
-
+async def generate_summary(context: str) -> str:
     messages = [
         {
             "role": "system",
@@ -147,25 +202,27 @@ def generate_summary(context: str) -> str:
         },
     ]
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=cast(Any, messages),  # type: ignore[arg-type]
-    )
-    r = response.choices[0].message.content or ""
-    r.replace("```html", "").replace("```", "")
-    return r
-
-
-def add_news_to_database(summary: str, source: str, title: str, image: str):
-    """Create a NewsFeed item and add it to the database"""
-    news_feed = NewsFeed(
-        title=title,
-        content=summary,
-        source=source,
-        score=0,
-        image=image,
+    r = await llm.chat(messages)
+    return r.replace("```html", "").replace("```", "")
+
+
+async def generate_summaries(contexts: list[str]) -> list[str | None]:
+    """
+    Summarise several contexts in parallel, bounded by LLM_CONCURRENCY.
+    Returns one summary per context, None where the call failed.
+    """
+    return await llm.gather_limited(
+        [lambda c=context: generate_summary(c) for context in contexts]
     )
-    engine = create_engine(DATABASE_URL, echo=True)
-    with Session(engine) as session:
-        session.add(news_feed)
-        session.commit()
+
+
+def add_news_to_database(
+    summary: str, source: str, title: str, image: str, urls: list[str] | None = None
+) -> int:
+    """
+    Create a single NewsFeed item and mark the page urls it was written
+    from as seen. Returns the id. Pipeline runs use store.store_news to
+    write all of their items at once.
+    """
+    item = store.NewsItem(title=title, content=summary, source=source, image=image, urls=urls or [])
+    return store.store_news([item], run_id=uuid.uuid4().hex)[title]
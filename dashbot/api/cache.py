@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from dashbot.config import logger
+
+
+CACHE_PATH = os.getenv("DASHBOT_CACHE_PATH", ".cache/dashbot.sqlite3")
+# Seconds between sweeps of expired entries, at most the ttl
+PURGE_INTERVAL = float(os.getenv("CACHE_PURGE_INTERVAL", "60"))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def make_key(*parts: Any) -> str:
+    """Stable hash of JSON serialisable key parts."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Cache:
+    """
+    Persistent key/value cache in a local SQLite file. Values are stored
+    as JSON. Entries older than `ttl` seconds are treated as missing
+    (ttl=None keeps them forever) and the least recently used entries are
+    evicted once the namespace holds more than `max_entries` entries or
+    `max_bytes` bytes. Several namespaces can share one file.
+
+    Calls block on SQLite, so async code runs them in a thread
+    (asyncio.to_thread). The file is opened on first use.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float | None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        path: str = CACHE_PATH,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.stats = CacheStats()
+        # Extraction runs in worker threads, so share one guarded connection
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        # Entries and bytes of the namespace, so writes only evict when over budget
+        self._count = 0
+        self._bytes = 0
+        self._purged_at = 0.0
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_lru ON cache (namespace, accessed_at)")
+            self._db = conn
+            self._recount()
+        return self._db
+
+    def _recount(self) -> None:
+        self._count, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+
+    def _fresh(self, created_at: float, now: float) -> bool:
+        return self.ttl is None or now - created_at < self.ttl
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached value, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None or not self._fresh(row[1], now):
+                self.stats.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+        self.stats.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value and evict whatever no longer fits."""
+        now = time.time()
+        raw = json.dumps(value, ensure_ascii=False)
+        size = len(raw.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, raw, size, now, now),
+            )
+            self._count += old is None
+            self._bytes += size - (old[0] if old else 0)
+            self._evict(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+            self._recount()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            self._recount()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return row[0]
+
+    def _evict(self, now: float) -> None:
+        # Expired entries are already misses, so they are purged on a timer,
+        # which also corrects the counters for writes by other processes
+        if self.ttl is not None and now - self._purged_at >= min(self.ttl, PURGE_INTERVAL):
+            self._purged_at = now
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND created_at <= ?",
+                (self.namespace, now - self.ttl),
+            )
+            self._recount()
+        over_entries = self.max_entries is not None and self._count > self.max_entries
+        over_bytes = self.max_bytes is not None and self._bytes > self.max_bytes
+        if not over_entries and not over_bytes:
+            return
+        # Walk the LRU index from the oldest entry until both budgets fit
+        excess_entries = self._count - self.max_entries if self.max_entries is not None else 0
+        excess_bytes = self._bytes - self.max_bytes if self.max_bytes is not None else 0
+        victims = []
+        cursor = self._conn.execute(
+            "SELECT key, size FROM cache WHERE namespace = ? ORDER BY accessed_at, key",
+            (self.namespace,),
+        )
+        for key, size in cursor:
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            victims.append((self.namespace, key))
+            excess_entries -= 1
+            excess_bytes -= size
+            self._count -= 1
+            self._bytes -= size
+        cursor.close()
+        self._conn.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", victims)
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"{self.namespace} cache: {self.stats.hits} hits, {self.stats.misses} misses "
+            f"({self.stats.hit_rate:.0%} hit rate)"
+        )
@@ -0,0 +1,64 @@
+import os
+import re
+import zlib
+
+import numpy as np
+
+
+# Size of the hashed feature space for titles and snippets
+CLUSTER_FEATURES = int(os.getenv("CLUSTER_FEATURES", str(2**14)))
+# Minimum cosine similarity between a page and a cluster centroid to join it
+CLUSTER_THRESHOLD = float(os.getenv("CLUSTER_THRESHOLD", "0.25"))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _features(text: str) -> list[str]:
+    words = [w for w in _WORD.findall(text.lower()) if len(w) > 1]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def vectorise(texts: list[str], dim: int = CLUSTER_FEATURES) -> np.ndarray:
+    """
+    TF-IDF vectors over hashed word unigrams and bigrams, one L2 normalised
+    row per text. Hashing keeps the vocabulary out of memory and the
+    dimension fixed however many pages come in.
+    """
+    counts = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            counts[row, zlib.crc32(feature.encode("utf-8")) % dim] += 1
+    tf = np.log1p(counts)
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1
+    vectors = tf * idf.astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def cluster(vectors: np.ndarray, threshold: float = CLUSTER_THRESHOLD) -> list[list[int]]:
+    """
+    Single pass centroid clustering: each row joins the most similar
+    existing cluster if the cosine similarity to its centroid reaches
+    `threshold`, otherwise it starts a new one. The similarity of a row to
+    all centroids is one matrix-vector product. Returns row indices per
+    cluster, largest clusters first.
+    """
+    if len(vectors) == 0:
+        return []
+    sums = np.zeros_like(vectors)
+    members: list[list[int]] = []
+    for row, vector in enumerate(vectors):
+        k = len(members)
+        if k:
+            centroids = sums[:k]
+            norms = np.linalg.norm(centroids, axis=1)
+            sims = centroids @ vector / np.where(norms == 0, 1, norms)
+            best = int(np.argmax(sims))
+            if sims[best] >= threshold:
+                sums[best] += vector
+                members[best].append(row)
+                continue
+        sums[k] = vector
+        members.append([row])
+    return sorted(members, key=len, reverse=True)
@@ -0,0 +1,136 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from dashbot.config import logger
+
+try:
+    import tiktoken
+except ImportError:  # optional, fall back to an estimate
+    tiktoken = None
+
+
+# Tokens of article text sent to generate_summary per topic
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+# Long paragraphs are split into passages of roughly this size
+PASSAGE_TOKENS = int(os.getenv("CONTEXT_PASSAGE_TOKENS", "120"))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PIECE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens locally. Uses tiktoken's o200k_base (the gpt-4o family
+    encoding) when it is installed, otherwise estimates about one token per
+    four characters of each word plus one per punctuation mark.
+    """
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text, disallowed_special=()))
+    return sum(max(1, math.ceil(len(p) / 4)) for p in _PIECE.findall(text))
+
+
+@dataclass(frozen=True)
+class Passage:
+    article: int
+    position: int
+    text: str
+    tokens: int
+
+
+def split_passages(text: str, max_tokens: int = PASSAGE_TOKENS) -> list[str]:
+    """Split an article into paragraphs, breaking long ones on sentences."""
+    passages: list[str] = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            passages.append(paragraph)
+            continue
+        current: list[str] = []
+        size = 0
+        for sentence in _SENTENCE.split(paragraph):
+            tokens = count_tokens(sentence)
+            if current and size + tokens > max_tokens:
+                passages.append(" ".join(current))
+                current, size = [], 0
+            current.append(sentence)
+            size += tokens
+        if current:
+            passages.append(" ".join(current))
+    return passages
+
+
+def _terms(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if len(w) > 2]
+
+
+def _score(passage: Passage, query: Counter, idf: dict[str, float]) -> float:
+    """Overlap with the query terms, normalised by length, favouring the lead."""
+    terms = Counter(_terms(passage.text))
+    overlap = sum(min(terms[t], 3) * idf.get(t, 1.0) * w for t, w in query.items() if t in terms)
+    length = math.sqrt(max(sum(terms.values()), 1))
+    lead = 1.0 / (1 + passage.position)
+    return overlap / length + 0.5 * lead
+
+
+def build_context(
+    topic: str, articles: list[tuple[str, str]], budget: int = CONTEXT_TOKEN_BUDGET
+) -> str:
+    """
+    Assemble the summary context for a topic from (title, content) pairs
+    within `budget` tokens. Every title is kept; passages are ranked by
+    relevance to the topic label and the titles, each article first gets an
+    equal share of what is left and unused share goes to the best remaining
+    passages. Chosen passages keep their original order.
+    """
+    titles = [title or "" for title, _ in articles]
+    used = sum(count_tokens(t) + 1 for t in titles)
+    passages = [
+        Passage(i, pos, text, count_tokens(text))
+        for i, (_, content) in enumerate(articles)
+        for pos, text in enumerate(split_passages(content or ""))
+    ]
+    query = Counter(_terms(topic) * 3 + [t for title in titles for t in _terms(title)])
+    # Rare terms across passages weigh more than ones found everywhere
+    doc_freq = Counter(t for p in passages for t in set(_terms(p.text)))
+    idf = {t: math.log(1 + len(passages) / (1 + doc_freq[t])) for t in query}
+    ranked = sorted(passages, key=lambda p: _score(p, query, idf), reverse=True)
+
+    remaining = max(budget - used, 0)
+    share = remaining // max(len(articles), 1)
+    spent = [0] * len(articles)
+    chosen: set[Passage] = set()
+    # First pass: every article fills its own share with its best passages
+    for p in ranked:
+        if spent[p.article] + p.tokens <= share:
+            chosen.add(p)
+            spent[p.article] += p.tokens
+    # Second pass: whatever is left goes to the best passages overall
+    left = remaining - sum(spent)
+    for p in ranked:
+        if p not in chosen and p.tokens <= left:
+            chosen.add(p)
+            left -= p.tokens
+
+    bodies: list[list[str]] = [[] for _ in articles]
+    for p in sorted(chosen, key=lambda p: (p.article, p.position)):
+        bodies[p.article].append(p.text)
+    context = "\n\n".join(
+        "\n".join([title, *body]) for title, body in zip(titles, bodies)
+    )
+    total = used + sum(p.tokens for p in passages)
+    logger.info(
+        f"Context for topic '{topic}': {used + sum(p.tokens for p in chosen)} tokens sent "
+        f"of {total} available (budget {budget}, {len(chosen)}/{len(passages)} passages)"
+    )
+    return context
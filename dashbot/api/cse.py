@@ -1,13 +1,48 @@
-from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any
+from urllib.parse import urlsplit
+import asyncio
+import multiprocessing
 import os
+import time
 
 from newspaper import Article
-from googleapiclient.discovery import build
-import httpx
-
+from dashbot.api import http_client
+from dashbot.api.cache import Cache, make_key
+from dashbot.api.scheduler import scheduler
+from dashbot.api.urls import canonical_url
 from dashbot.config import logger
 
 
+# Limits for the article extraction stage
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "16"))
+EXTRACT_PER_DOMAIN = int(os.getenv("EXTRACT_PER_DOMAIN", "2"))
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "20"))
+
+# Custom Search endpoint; benchmarks point it at a local stub
+GOOGLE_CSE_URL = os.getenv("GOOGLE_CSE_URL", "https://customsearch.googleapis.com/customsearch/v1")
+
+# Cache for search results, CSE_CACHE_TTL=0 disables it
+CSE_CACHE_TTL = float(os.getenv("CSE_CACHE_TTL", str(6 * 60 * 60)))
+CSE_CACHE_MAX_ENTRIES = int(os.getenv("CSE_CACHE_MAX_ENTRIES", "1000"))
+
+# Store of parsed articles, reused without a request for ARTICLE_MAX_AGE
+# seconds and revalidated with a conditional GET afterwards
+ARTICLE_MAX_AGE = float(os.getenv("ARTICLE_MAX_AGE", str(24 * 60 * 60)))
+ARTICLE_CACHE_MAX_ENTRIES = int(os.getenv("ARTICLE_CACHE_MAX_ENTRIES", "5000"))
+ARTICLE_CACHE_MAX_BYTES = int(os.getenv("ARTICLE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+ARTICLE_USER_AGENT = os.getenv("ARTICLE_USER_AGENT", "Mozilla/5.0 (compatible; dashbot/0.1)")
+
+# Parsing is CPU bound and holds the GIL: with PARSE_WORKERS > 0 pages are
+# parsed in a pool of that many processes, with 0 in a thread of this one.
+# 0 is the default, so web replicas running the in-process job worker do
+# not keep a pool; the standalone worker and the CLI use one process per
+# CPU (see use_parse_processes)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))
+
+
 class GoogleCSEError(Exception):
     pass
 
@@ -25,7 +60,18 @@ class GoogleCSE:
     query: str
 
 
-async def search_google(query: str) -> list[GoogleCSE]:
+_search_cache: Cache | None = None
+
+
+def search_cache() -> Cache:
+    """The CSE result cache, opened on first use."""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = Cache("cse", ttl=CSE_CACHE_TTL, max_entries=CSE_CACHE_MAX_ENTRIES)
+    return _search_cache
+
+
+async def search_google(query: str, use_cache: bool = True) -> list[GoogleCSE]:
     # Get API credentials from environment variables
     google_api_key = os.getenv("GOOGLE_API_KEY")
     google_cse_id = os.getenv("GOOGLE_CSE_ID")
@@ -33,7 +79,7 @@ async def search_google(query: str) -> list[GoogleCSE]:
     if not google_api_key or not google_cse_id:
         raise GoogleEnvError("missing google api key or cse id")
 
-    url = "https://customsearch.googleapis.com/customsearch/v1"
+    url = GOOGLE_CSE_URL
     params = {
         "q": query,
         "cx": google_cse_id,
@@ -42,21 +88,30 @@ async def search_google(query: str) -> list[GoogleCSE]:
         "sort": "date",
         # "lr": "lang_de", # delete?
     }
+    use_cache = use_cache and CSE_CACHE_TTL > 0
+    # The api key is left out so rotating it keeps the cache warm
+    cache_key = make_key(url, {k: v for k, v in params.items() if k != "key"})
+    if use_cache:
+        cached = await asyncio.to_thread(search_cache().get, cache_key)
+        if cached is not None:
+            return [GoogleCSE(**item) for item in cached]
+
     res = []
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params)
-        _ = resp.raise_for_status()
-        r = resp.json()
-        for item in r.get("items", []):
-            res.append(
-                GoogleCSE(
-                    url=item.get("link"),
-                    title=item.get("title"),
-                    snippet=item.get("snippet"),
-                    source=item.get("displayLink"),
-                    query=query,
-                )
+    resp = await http_client.request("GET", url, params=params)
+    _ = resp.raise_for_status()
+    r = resp.json()
+    for item in r.get("items", []):
+        res.append(
+            GoogleCSE(
+                url=item.get("link"),
+                title=item.get("title"),
+                snippet=item.get("snippet"),
+                source=item.get("displayLink"),
+                query=query,
             )
+        )
+    if use_cache:
+        await asyncio.to_thread(search_cache().set, cache_key, [asdict(p) for p in res])
     return res
 
 
@@ -70,23 +125,191 @@ class WebArticle:
     google_cse: GoogleCSE
 
 
-def extract_article(page: GoogleCSE) -> WebArticle:
+def parse_html(url: str, html: str | bytes, encoding: str | None = None) -> dict[str, Any]:
+    """
+    Run newspaper3k's extraction on already downloaded html. Module level
+    and plain in/out so it can run in a worker process: raw bytes go in,
+    only the fields of a WebArticle come back.
+    """
+    if isinstance(html, bytes):
+        html = html.decode(encoding or "utf-8", errors="replace")
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+
+    # Extract main content
+    publish_date = article.publish_date
+    return {
+        "authors": article.authors,
+        "content": article.text,
+        "source": article.source_url if hasattr(article, "source_url") else url,
+        "publish_date": publish_date.isoformat() if publish_date else None,
+    }
+
+
+def parse_article(page: GoogleCSE, html: str) -> WebArticle:
+    return WebArticle(**parse_html(page.url, html), google_cse=page)
+
+
+_parse_pool: ProcessPoolExecutor | None = None
+
+
+def parse_pool() -> ProcessPoolExecutor | None:
+    """The parser processes, started on first use; None when PARSE_WORKERS is 0."""
+    global _parse_pool
+    if _parse_pool is None and PARSE_WORKERS > 0:
+        # spawn, not fork: the parent runs threads and an event loop
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+
+def use_parse_processes() -> None:
+    """Parse in one process per CPU unless PARSE_WORKERS is set; for processes that only scrape."""
+    global PARSE_WORKERS
+    if "PARSE_WORKERS" not in os.environ:
+        PARSE_WORKERS = os.cpu_count() or 1
+
+
+def close_parse_pool() -> None:
+    """Stop the parser processes, if any were started."""
+    global _parse_pool
+    if _parse_pool is None:
+        return
+    pool, _parse_pool = _parse_pool, None
+    pool.shutdown(cancel_futures=True)
+
+
+async def parse_page(page: GoogleCSE, html: bytes, encoding: str | None = None) -> WebArticle:
+    """Parse downloaded html off the event loop, in the parser pool if there is one."""
+    pool = parse_pool()
+    if pool is None:
+        fields = await asyncio.to_thread(parse_html, page.url, html, encoding)
+    else:
+        loop = asyncio.get_running_loop()
+        fields = await loop.run_in_executor(pool, parse_html, page.url, html, encoding)
+    return WebArticle(**fields, google_cse=page)
+
+
+def extract_article(page: GoogleCSE, timeout: float = EXTRACT_TIMEOUT) -> WebArticle:
     if not page.url:
         logger.warning("no url found for source: ", page.source)
         return WebArticle([], "", "", None, page)
-    article = Article(page.url)
+    article = Article(page.url, request_timeout=timeout)
     article.download()
-    article.parse()
+    return parse_article(page, article.html)
+
+
+_article_cache: Cache | None = None
 
-    # Extract main content
-    main_content = article.text
-    authors = article.authors
-    publish_date = article.publish_date
 
+def article_cache() -> Cache:
+    """The parsed article store, opened on first use."""
+    global _article_cache
+    if _article_cache is None:
+        _article_cache = Cache(
+            "articles",
+            ttl=None,
+            max_entries=ARTICLE_CACHE_MAX_ENTRIES,
+            max_bytes=ARTICLE_CACHE_MAX_BYTES,
+        )
+    return _article_cache
+
+
+def _stored_article(stored: dict, page: GoogleCSE) -> WebArticle:
     return WebArticle(
-        authors=authors,
-        content=main_content,
-        source=article.source_url if hasattr(article, "source_url") else page.url,
-        publish_date=publish_date.isoformat() if publish_date else None,
+        authors=stored["authors"],
+        content=stored["content"],
+        source=stored["source"],
+        publish_date=stored["publish_date"],
         google_cse=page,
     )
+
+
+async def fetch_article(page: GoogleCSE, timeout: float = EXTRACT_TIMEOUT) -> WebArticle:
+    """
+    Download and parse a page through the article store. A stored parse
+    younger than ARTICLE_MAX_AGE is returned without a request; an older
+    one is revalidated with If-None-Match/If-Modified-Since and reused
+    when the site answers 304. Parsing runs off the loop (see parse_page).
+    The request and the parse each get `timeout` seconds, counted from when
+    the host's slot in the scheduler is acquired (asyncio.TimeoutError).
+    """
+    if not page.url:
+        logger.warning("no url found for source: ", page.source)
+        return WebArticle([], "", "", None, page)
+    cache = article_cache()
+    key = canonical_url(page.url)
+    stored = await asyncio.to_thread(cache.get, key)
+    now = time.time()
+    if stored is not None and now - stored["fetched_at"] < ARTICLE_MAX_AGE:
+        return _stored_article(stored, page)
+
+    headers = {"User-Agent": ARTICLE_USER_AGENT}
+    if stored is not None and stored.get("etag"):
+        headers["If-None-Match"] = stored["etag"]
+    if stored is not None and stored.get("last_modified"):
+        headers["If-Modified-Since"] = stored["last_modified"]
+    resp = await http_client.request(
+        "GET", page.url, headers=headers, timeout=timeout, robots=True, attempt_timeout=timeout
+    )
+    if resp.status_code == 304 and stored is not None:
+        stored["fetched_at"] = now
+        await asyncio.to_thread(cache.set, key, stored)
+        return _stored_article(stored, page)
+    _ = resp.raise_for_status()
+
+    article = await asyncio.wait_for(parse_page(page, resp.content, resp.encoding), timeout)
+    await asyncio.to_thread(
+        cache.set,
+        key,
+        {
+            "authors": article.authors,
+            "content": article.content,
+            "source": article.source,
+            "publish_date": article.publish_date,
+            "etag": resp.headers.get("etag"),
+            "last_modified": resp.headers.get("last-modified"),
+            "fetched_at": now,
+        },
+    )
+    return article
+
+
+async def extract_articles(
+    pages: list[GoogleCSE],
+    concurrency: int = EXTRACT_CONCURRENCY,
+    per_domain: int = EXTRACT_PER_DOMAIN,
+    timeout: float = EXTRACT_TIMEOUT,
+) -> list[WebArticle | None]:
+    """
+    Extract all pages concurrently. At most `concurrency` pages are fetched
+    at once and at most `per_domain` of them from the same host, each through
+    the article store (see fetch_article). Returns one entry per page in the
+    same order, None where the extraction failed or took longer than
+    `timeout` seconds once the host's turn came (waiting for a Crawl-delay
+    or Retry-After is not counted).
+    """
+    limit = asyncio.Semaphore(concurrency)
+    domains: defaultdict[str, asyncio.Semaphore] = defaultdict(
+        lambda: asyncio.Semaphore(per_domain)
+    )
+
+    async def extract(page: GoogleCSE) -> WebArticle | None:
+        domain = urlsplit(page.url or "").hostname or ""
+        # Take the domain slot first so a page waiting on a busy host
+        # does not hold one of the global slots.
+        async with domains[domain], limit:
+            try:
+                return await fetch_article(page, timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Timed out extracting article after {timeout}s: {page.url}")
+            except Exception as e:
+                logger.error(f"Error extracting article: {e}\n Page: {page}")
+            return None
+
+    articles = list(await asyncio.gather(*(extract(p) for p in pages)))
+    article_cache().log_stats()
+    logger.info(f"Fetch scheduler: {scheduler.stats()}")
+    return articles
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import re
+
+from dashbot.api.cse import GoogleCSE
+from dashbot.api.urls import canonical_url
+from dashbot.config import logger
+
+
+# Pages whose title+snippet fingerprints differ in at most this many bits
+# are treated as copies of the same story
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "4"))
+# Texts with fewer words than this are too short to fingerprint reliably
+DEDUP_MIN_TOKENS = int(os.getenv("DEDUP_MIN_TOKENS", "6"))
+
+SIMHASH_BITS = 64
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def simhash(tokens: list[str]) -> int:
+    """64 bit SimHash over word unigrams and bigrams."""
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def _bands(fingerprint: int, count: int) -> list[tuple[int, int]]:
+    """
+    Split a fingerprint into `count` bands. Two fingerprints within
+    count - 1 bits of each other agree on at least one whole band, so only
+    pages sharing a band need to be compared.
+    """
+    width = SIMHASH_BITS // count
+    mask = (1 << width) - 1
+    return [(i, fingerprint >> (i * width) & mask) for i in range(count)]
+
+
+def dedupe_pages(
+    pages: list[GoogleCSE], max_distance: int = DEDUP_MAX_DISTANCE
+) -> list[GoogleCSE]:
+    """
+    Drop pages that point at the same canonical url, or whose title and
+    snippet are near duplicates of an earlier page. The first copy of a
+    story is kept and order is preserved. Topic.pages ids index into the
+    returned list, so it has to replace `pages` before generate_topics.
+    """
+    seen_urls: set[str] = set()
+    buckets: dict[tuple[int, int], list[int]] = {}
+    result: list[GoogleCSE] = []
+    dropped_url = dropped_text = 0
+    for page in pages:
+        url = canonical_url(page.url or "")
+        if url and url in seen_urls:
+            dropped_url += 1
+            continue
+
+        tokens = _tokens(f"{page.title or ''} {page.snippet or ''}")
+        fingerprint = simhash(tokens) if len(tokens) >= DEDUP_MIN_TOKENS else None
+        if fingerprint is not None:
+            bands = _bands(fingerprint, max_distance + 1)
+            candidates = {f for band in bands for f in buckets.get(band, [])}
+            if any((fingerprint ^ f).bit_count() <= max_distance for f in candidates):
+                dropped_text += 1
+                continue
+            for band in bands:
+                buckets.setdefault(band, []).append(fingerprint)
+
+        if url:
+            seen_urls.add(url)
+        result.append(page)
+
+    if dropped_url or dropped_text:
+        logger.info(
+            f"Deduplicated {len(pages)} pages to {len(result)} "
+            f"({dropped_url} same url, {dropped_text} near-duplicate text)"
+        )
+    return result
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import random
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import httpx
+
+from dashbot.api.scheduler import FetchDisallowed, scheduler
+from dashbot.config import logger
+
+
+# Pool and retry settings for the shared client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_MAX_BACKOFF = float(os.getenv("HTTP_MAX_BACKOFF", "30"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client: httpx.AsyncClient | None = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def start(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    """
+    Create the process-wide client. Called on FastAPI startup and by the
+    CLI entry point; `transport` lets tests plug in a mock transport.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    _client = httpx.AsyncClient(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        transport=transport,
+    )
+    return _client
+
+
+async def close() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is None:
+        return
+    client, _client = _client, None
+    await client.aclose()
+
+
+@asynccontextmanager
+async def session() -> AsyncIterator[httpx.AsyncClient]:
+    """Open the shared client for the duration of a block (CLI, scripts)."""
+    client = await start()
+    try:
+        yield client
+    finally:
+        await close()
+
+
+def get_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("http client is not started, call http_client.start() first")
+    return _client
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    """Seconds to wait according to a Retry-After header, if any."""
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+async def request(
+    method: str,
+    url: str,
+    retries: int = HTTP_RETRIES,
+    backoff: float = HTTP_BACKOFF,
+    robots: bool = False,
+    attempt_timeout: float | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Send a request over the shared client. Every attempt waits for a slot
+    of the host in the politeness scheduler, and with `robots` the host's
+    robots.txt must allow the url (FetchDisallowed otherwise). Transport
+    errors and 429/5xx responses are retried with exponential backoff and
+    jitter, honouring Retry-After when the server sends one. The last
+    response is returned as is, so callers still decide what to do with an
+    error status. `attempt_timeout` bounds each attempt from the moment its
+    slot is acquired (asyncio.TimeoutError), so time spent waiting for a
+    slow host's turn does not count against it.
+    """
+    client = get_client()
+    if robots and not await scheduler.allowed(url, client):
+        raise FetchDisallowed(f"robots.txt disallows {url}")
+    attempt = 0
+    while True:
+        await scheduler.acquire(url)
+        try:
+            resp = await asyncio.wait_for(client.request(method, url, **kwargs), attempt_timeout)
+        except httpx.TransportError as e:
+            if attempt >= retries:
+                raise
+            delay = backoff * 2**attempt
+            reason = str(e) or type(e).__name__
+        else:
+            retry_after = _retry_after(resp)
+            scheduler.feedback(url, resp.status_code, retry_after)
+            if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                return resp
+            delay = retry_after if retry_after is not None else backoff * 2**attempt
+            reason = f"status {resp.status_code}"
+            await resp.aclose()
+        delay = min(delay + random.uniform(0, backoff), HTTP_MAX_BACKOFF)
+        attempt += 1
+        logger.warning(f"Retrying {method} {url} in {delay:.2f}s ({reason}, attempt {attempt}/{retries})")
+        await asyncio.sleep(delay)
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import random
+import re
+from collections.abc import Awaitable, Callable
+from typing import Any, Protocol, TypeVar, cast
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from dashbot.api.cache import Cache, make_key
+from dashbot.config import logger
+
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "5"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "5"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "1"))
+LLM_MAX_BACKOFF = float(os.getenv("LLM_MAX_BACKOFF", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+# Response cache, LLM_CACHE_TTL=0 disables it
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+# "record" appends every call to LLM_REPLAY_FILE, "replay" answers only from it
+LLM_REPLAY_MODE = os.getenv("LLM_REPLAY_MODE", "")
+LLM_REPLAY_FILE = os.getenv("LLM_REPLAY_FILE", "llm_replay.jsonl")
+
+Messages = list[dict[str, str]]
+T = TypeVar("T")
+
+
+class LLMBackend(Protocol):
+    """Anything that can answer a chat completion request."""
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> str: ...
+
+    async def close(self) -> None: ...
+
+
+class OpenAIBackend:
+    """
+    Chat completions over one shared AsyncOpenAI client. Point `base_url`
+    (or OPENAI_BASE_URL) at any OpenAI-compatible server, e.g. a local fake
+    for tests and benchmarks. Retries are left to chat().
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+    ):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY is not set")
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+            timeout=LLM_TIMEOUT,
+            max_retries=0,
+            http_client=http_client,
+        )
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> str:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=cast(Any, messages),  # type: ignore[arg-type]
+            **params,
+        )
+        return response.choices[0].message.content or ""
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def request_key(model: str, messages: Messages, params: dict[str, Any]) -> str:
+    return make_key(model, messages, params)
+
+
+class CachingBackend:
+    """Answers byte-identical requests from a persistent response cache."""
+
+    def __init__(self, inner: LLMBackend, cache: Cache):
+        self.inner = inner
+        self.cache = cache
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> str:
+        key = request_key(model, messages, params)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+        reply = await self.inner.complete(model, messages, **params)
+        await asyncio.to_thread(self.cache.set, key, reply)
+        return reply
+
+    async def close(self) -> None:
+        self.cache.log_stats()
+        await self.inner.close()
+
+
+class RecordingBackend:
+    """Appends every request and its response to a JSONL file."""
+
+    def __init__(self, inner: LLMBackend, path: str):
+        self.inner = inner
+        self.path = path
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> str:
+        reply = await self.inner.complete(model, messages, **params)
+        record = {
+            "key": request_key(model, messages, params),
+            "model": model,
+            "messages": messages,
+            "params": params,
+            "response": reply,
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return reply
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+class ReplayBackend:
+    """Answers only from a file written by RecordingBackend, never the network."""
+
+    def __init__(self, path: str):
+        self.responses: dict[str, str] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.responses[record["key"]] = record["response"]
+
+    async def complete(self, model: str, messages: Messages, **params: Any) -> str:
+        key = request_key(model, messages, params)
+        if key not in self.responses:
+            raise LookupError(f"no recorded response for {model} request {key[:12]}")
+        return self.responses[key]
+
+    async def close(self) -> None:
+        pass
+
+
+_backend: LLMBackend | None = None
+
+
+def default_backend() -> LLMBackend:
+    """OpenAI behind the response cache, or the replay file in replay mode."""
+    if LLM_REPLAY_MODE == "replay":
+        return ReplayBackend(LLM_REPLAY_FILE)
+    backend: LLMBackend = OpenAIBackend()
+    if LLM_CACHE_TTL > 0:
+        cache = Cache(
+            "llm",
+            ttl=LLM_CACHE_TTL,
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            max_bytes=LLM_CACHE_MAX_BYTES,
+        )
+        backend = CachingBackend(backend, cache)
+    if LLM_REPLAY_MODE == "record":
+        # Outermost, so cache hits are recorded as well
+        backend = RecordingBackend(backend, LLM_REPLAY_FILE)
+    return backend
+
+
+def get_backend() -> LLMBackend:
+    """The backend in use, default_backend() unless one was set."""
+    global _backend
+    if _backend is None:
+        _backend = default_backend()
+    return _backend
+
+
+def set_backend(backend: LLMBackend | None) -> None:
+    global _backend
+    _backend = backend
+
+
+async def close() -> None:
+    """Close the backend and its pooled connections."""
+    global _backend
+    if _backend is None:
+        return
+    backend, _backend = _backend, None
+    await backend.close()
+
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str) -> float | None:
+    """Parse OpenAI reset durations such as "20ms", "1s" or "6m0s"."""
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _UNITS[unit] for n, unit in parts)
+
+
+def _retry_delay(error: Exception) -> float | None:
+    """Seconds to wait according to the rate-limit headers of an error response."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if "retry-after" in headers:
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    resets = [
+        _parse_duration(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if name in headers
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+async def chat(
+    messages: Messages,
+    model: str = LLM_MODEL,
+    retries: int = LLM_RETRIES,
+    backoff: float = LLM_BACKOFF,
+    **params: Any,
+) -> str:
+    """
+    Send a chat completion through the backend. Rate limits, connection
+    errors and 5xx responses are retried with exponential backoff, waiting
+    at least as long as the rate-limit headers ask for.
+    """
+    backend = get_backend()
+    attempt = 0
+    while True:
+        try:
+            return await backend.complete(model, messages, **params)
+        except Exception as e:
+            if not _retryable(e) or attempt >= retries:
+                raise
+            delay = backoff * 2**attempt
+            requested = _retry_delay(e)
+            if requested is not None:
+                delay = max(delay, requested)
+            delay = min(delay + random.uniform(0, backoff), LLM_MAX_BACKOFF)
+            attempt += 1
+            logger.warning(f"Retrying LLM call in {delay:.2f}s ({type(e).__name__}, attempt {attempt}/{retries})")
+            await asyncio.sleep(delay)
+
+
+async def gather_limited(
+    calls: list[Callable[[], Awaitable[T]]], concurrency: int = LLM_CONCURRENCY
+) -> list[T | None]:
+    """
+    Run LLM calls with at most `concurrency` in flight. Results keep the
+    order of `calls`; a call that fails is logged and yields None.
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(call: Callable[[], Awaitable[T]]) -> T | None:
+        async with limit:
+            try:
+                return await call()
+            except Exception as e:
+                logger.error(f"LLM call failed: {e}")
+                return None
+
+    return list(await asyncio.gather(*(run(c) for c in calls)))
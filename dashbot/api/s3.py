@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, TypeVar
+
+from dashbot.api.cache import CACHE_PATH, CacheStats
+from dashbot.api.scheduler import scheduler
+from dashbot.config import logger
+
+
+S3_BUCKET = os.getenv("AWS_S3_BUCKET_NAME", "website-dashbot")
+S3_IMAGE_PREFIX = "news-images"
+
+# Local copies of served images, least recently used ones are deleted
+# once the directory holds more than IMAGE_CACHE_MAX_BYTES
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(CACHE_PATH), "images"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+STREAM_CHUNK = 64 * 1024
+
+T = TypeVar("T")
+
+CONTENT_TYPES = {".png": "image/png", ".gif": "image/gif", ".webp": "image/webp"}
+
+
+def content_type_for(key: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(key.lower())[1], "image/jpeg")
+
+
+_client: Any = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Any:
+    """One boto3 S3 client for the process; clients are thread safe, creating them is not."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import boto3  # a few hundred ms, paid by the first image miss instead of every start
+
+            _client = boto3.client("s3")
+        return _client
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    key: str
+    path: str
+    size: int
+    etag: str
+    content_type: str
+
+
+class ImageCache:
+    """
+    Image bytes on local disk, one file per S3 key plus a small JSON
+    sidecar with its ETag and content type. The index of files lives in
+    memory in LRU order and is rebuilt from the directory on start.
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, CachedImage] = OrderedDict()
+        self._size = 0
+        self._load()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        for tmp in self.directory.glob("*.tmp*"):
+            tmp.unlink(missing_ok=True)
+        found = []
+        for meta in self.directory.glob("*.json"):
+            data = self.directory / meta.stem
+            try:
+                image = CachedImage(**json.loads(meta.read_text()))
+                found.append((data.stat().st_mtime, image))
+            except (OSError, ValueError, TypeError):
+                meta.unlink(missing_ok=True)
+                data.unlink(missing_ok=True)
+        for _, image in sorted(found, key=lambda f: f[0]):
+            self._entries[image.key] = image
+            self._size += image.size
+
+    def get(self, key: str) -> CachedImage | None:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+        # Recency survives restarts through the mtime
+        try:
+            os.utime(image.path)
+        except OSError:
+            pass
+        return image
+
+    def put(self, key: str, chunks: Iterator[bytes], etag: str | None, content_type: str) -> CachedImage:
+        """Write an image atomically; without an S3 ETag its sha256 is used."""
+        path = self._path(key)
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        image = CachedImage(key, str(path), size, etag or f'"{digest.hexdigest()[:32]}"', content_type)
+        os.replace(tmp, path)
+        path.with_suffix(".json").write_text(json.dumps(asdict(image)))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._size += size - (old.size if old else 0)
+            self._entries[key] = image
+            self._evict()
+        return image
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, image = self._entries.popitem(last=False)
+            self._size -= image.size
+            # stream() maps the file before a response starts, so responses
+            # still being sent keep their bytes
+            Path(image.path).unlink(missing_ok=True)
+            Path(image.path).with_suffix(".json").unlink(missing_ok=True)
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"image cache: {self.stats.hits} hits, {self.stats.misses} misses "
+            f"({self.stats.hit_rate:.0%} hit rate), {self._size / 1024 / 1024:.1f} MiB"
+        )
+
+
+_image_cache: ImageCache | None = None
+_downloads: dict[str, asyncio.Task] = {}
+
+
+def image_cache() -> ImageCache:
+    """The local image cache, opened on first use."""
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImageCache()
+    return _image_cache
+
+
+def log_stats() -> None:
+    if _image_cache is not None:
+        _image_cache.log_stats()
+
+
+def _download(key: str) -> CachedImage:
+    response = get_client().get_object(Bucket=S3_BUCKET, Key=f"{S3_IMAGE_PREFIX}/{key}")
+    body = response["Body"]
+    return image_cache().put(
+        key, body.iter_chunks(STREAM_CHUNK), response.get("ETag"), content_type_for(key)
+    )
+
+
+async def _fetch(key: str) -> CachedImage:
+    from botocore.exceptions import ClientError
+
+    host = f"{S3_BUCKET}.s3.amazonaws.com"
+    await scheduler.acquire(host)
+    try:
+        image = await asyncio.to_thread(_download, key)
+    except ClientError as e:
+        scheduler.feedback(host, e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 500))
+        raise
+    scheduler.feedback(host, 200)
+    return image
+
+
+async def shared_task(tasks: dict[str, asyncio.Task], key: str, start: Callable[[], Awaitable[T]]) -> T:
+    """
+    Await the task running for `key` in `tasks`, starting it with start()
+    if there is none, so concurrent callers share one run. The task belongs
+    to no caller: a caller that is cancelled (say the client disconnected)
+    stops waiting without cancelling it for the others.
+    """
+    task = tasks.get(key)
+    if task is None:
+        task = asyncio.ensure_future(start())
+        tasks[key] = task
+
+        def forget(done: asyncio.Task) -> None:
+            if tasks.get(key) is done:
+                del tasks[key]
+            if not done.cancelled():
+                done.exception()  # retrieved even when every caller went away
+
+        task.add_done_callback(forget)
+    return await asyncio.shield(task)
+
+
+async def get_image(key: str) -> CachedImage:
+    """
+    The image from the local cache, downloaded from S3 in a worker thread
+    on a miss. Concurrent misses for one key share a single download (see
+    shared_task).
+    """
+    # A thread: the first call scans the cache directory, hits touch the file
+    image = await asyncio.to_thread(lambda: image_cache().get(key))
+    if image is not None:
+        return image
+    return await shared_task(_downloads, key, lambda: _fetch(key))
+
+
+def stream(image: CachedImage) -> Iterator[bytes]:
+    """
+    The image file through a read-only memory map, in chunks. The file is
+    opened and mapped before this returns, so the chunks are still served
+    when the cache unlinks or replaces the file while they are being sent.
+    """
+    with open(image.path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return iter(())
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _chunks(mapped)
+
+
+def _chunks(mapped: mmap.mmap) -> Iterator[bytes]:
+    with mapped:
+        for start in range(0, len(mapped), STREAM_CHUNK):
+            yield mapped[start : start + STREAM_CHUNK]
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from dashbot.config import logger
+
+
+# Default pace per host, overridable per host suffix with
+# FETCH_HOST_RATES="example.com=0.5,googleapis.com=10"
+FETCH_RATE = float(os.getenv("FETCH_RATE", "1"))
+FETCH_BURST = int(os.getenv("FETCH_BURST", "2"))
+ROBOTS_TTL = float(os.getenv("ROBOTS_TTL", str(24 * 60 * 60)))
+ROBOTS_USER_AGENT = os.getenv("ROBOTS_USER_AGENT", "dashbot")
+MAX_CRAWL_DELAY = float(os.getenv("MAX_CRAWL_DELAY", "30"))
+MAX_HOST_BACKOFF = float(os.getenv("MAX_HOST_BACKOFF", "300"))
+
+# APIs we pay for are not crawled politely, they are paced by their quota
+HOST_RATES = {"googleapis.com": 10.0, "amazonaws.com": 100.0}
+for _item in filter(None, os.getenv("FETCH_HOST_RATES", "").split(",")):
+    _host, _, _rate = _item.partition("=")
+    HOST_RATES[_host.strip()] = float(_rate)
+
+THROTTLE_STATUSES = {429, 503}
+
+
+class FetchDisallowed(Exception):
+    pass
+
+
+@dataclass
+class HostState:
+    rate: float
+    burst: int
+    # Theoretical arrival time of the next request (GCRA), monotonic seconds
+    tat: float = 0.0
+    blocked_until: float = 0.0
+    backoff_level: int = 0
+    crawl_delay: float | None = None
+    robots: RobotFileParser | None = None
+    robots_fetched: float = 0.0
+    robots_future: asyncio.Future | None = field(default=None, repr=False)
+    requests: int = 0
+    waiting: int = 0
+    throttled: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def interval(self) -> float:
+        interval = 1 / self.rate
+        if self.crawl_delay is not None:
+            interval = max(interval, self.crawl_delay)
+        return interval
+
+
+def host_of(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        return (urlsplit(url_or_host).hostname or "").lower()
+    return url_or_host.lower()
+
+
+class Scheduler:
+    """
+    Paces outbound requests per host. Each host gets a token bucket
+    (`rate` requests per second, bursts of `burst`), slowed down to the
+    Crawl-delay of its robots.txt and backed off exponentially after
+    429/503 answers. Slots are reserved without locks, so waiting requests
+    are served in arrival order.
+    """
+
+    def __init__(self, rate: float = FETCH_RATE, burst: int = FETCH_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.hosts: dict[str, HostState] = {}
+
+    def _state(self, host: str) -> HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            rate = next(
+                (r for suffix, r in HOST_RATES.items() if host == suffix or host.endswith("." + suffix)),
+                self.rate,
+            )
+            state = HostState(rate=rate, burst=self.burst)
+            self.hosts[host] = state
+        return state
+
+    async def acquire(self, url_or_host: str) -> float:
+        """Wait for the next free slot of the host; returns the seconds waited."""
+        state = self._state(host_of(url_or_host))
+        now = time.monotonic()
+        interval = state.interval
+        burst = 1 if state.crawl_delay is not None else state.burst
+        tat = max(state.tat, now, state.blocked_until)
+        wait = max(tat - (burst - 1) * interval - now, state.blocked_until - now, 0.0)
+        state.tat = tat + interval
+        state.requests += 1
+        state.total_wait += wait
+        state.max_wait = max(state.max_wait, wait)
+        if wait > 0:
+            state.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # The slot was never used: give it back so later requests
+                # to the host are not pushed back by it, unless one already
+                # booked the next slot from it
+                if state.tat == tat + interval:
+                    state.tat = tat
+                state.requests -= 1
+                state.total_wait -= wait
+                raise
+            finally:
+                state.waiting -= 1
+        return wait
+
+    def feedback(self, url_or_host: str, status: int, retry_after: float | None = None) -> None:
+        """Back off a host after 429/503 and recover slowly after successes."""
+        host = host_of(url_or_host)
+        state = self._state(host)
+        if status in THROTTLE_STATUSES:
+            state.throttled += 1
+            state.backoff_level += 1
+            delay = retry_after if retry_after is not None else state.interval * 2**state.backoff_level
+            delay = min(delay, MAX_HOST_BACKOFF)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            logger.warning(f"{host} answered {status}, pausing it for {delay:.1f}s")
+        elif status < 400 and state.backoff_level:
+            state.backoff_level -= 1
+
+    async def allowed(self, url: str, client: httpx.AsyncClient) -> bool:
+        """Whether robots.txt lets us fetch `url`; also picks up Crawl-delay."""
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        state = self._state(host)
+        if state.robots is None or time.monotonic() - state.robots_fetched > ROBOTS_TTL:
+            if state.robots_future is None or state.robots_future.done():
+                state.robots_future = asyncio.ensure_future(
+                    self._fetch_robots(state, f"{parts.scheme}://{parts.netloc}/robots.txt", client)
+                )
+            await asyncio.shield(state.robots_future)
+        assert state.robots is not None
+        return state.robots.can_fetch(ROBOTS_USER_AGENT, url)
+
+    async def _fetch_robots(self, state: HostState, url: str, client: httpx.AsyncClient) -> None:
+        robots = RobotFileParser(url)
+        try:
+            resp = await client.get(url, timeout=10)
+            if resp.status_code in (401, 403):
+                robots.disallow_all = True
+            elif resp.status_code >= 400:
+                robots.allow_all = True
+            else:
+                robots.parse(resp.text.splitlines())
+        except httpx.HTTPError:
+            # Unreachable robots.txt: do not block, the fetch itself will tell
+            robots.allow_all = True
+        delay = robots.crawl_delay(ROBOTS_USER_AGENT)
+        state.crawl_delay = min(float(delay), MAX_CRAWL_DELAY) if delay else None
+        state.robots = robots
+        state.robots_fetched = time.monotonic()
+
+    def reset(self) -> None:
+        """Forget all host state, robots.txt files and stats."""
+        self.hosts.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth and wait times over all hosts, for logs and job status."""
+        states = list(self.hosts.values())
+        requests = sum(s.requests for s in states)
+        return {
+            "hosts": len(states),
+            "requests": requests,
+            "queue_depth": sum(s.waiting for s in states),
+            "throttled": sum(s.throttled for s in states),
+            "avg_wait": round(sum(s.total_wait for s in states) / requests, 3) if requests else 0.0,
+            "max_wait": round(max((s.max_wait for s in states), default=0.0), 3),
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,19 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from dashbot.api.cse import GoogleCSE
+from dashbot.api.urls import canonical_url
+from dashbot.config import logger
+from dashbot.scripts.database import SeenUrl
+
+
+def filter_unseen(session: Session, pages: list[GoogleCSE]) -> list[GoogleCSE]:
+    """Drop pages whose canonical url already went into a summary."""
+    urls = {canonical_url(p.url) for p in pages if p.url}
+    if not urls:
+        return pages
+    seen = set(session.scalars(select(SeenUrl.url).where(SeenUrl.url.in_(urls))))
+    result = [p for p in pages if not p.url or canonical_url(p.url) not in seen]
+    logger.info(f"{len(result)} of {len(pages)} pages are new since the last run")
+    return result
+
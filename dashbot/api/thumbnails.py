@@ -0,0 +1,82 @@
+import asyncio
+import io
+import os
+
+from PIL import Image, features
+
+from dashbot.api import s3
+from dashbot.api.s3 import CachedImage
+
+
+# Widths variants are rendered at; a requested width is rounded up to the
+# next one so arbitrary ?w= values cannot fill the cache
+THUMBNAIL_WIDTHS = tuple(
+    sorted(int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "50,100,200,400").split(","))
+)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+# Part of every variant key, bump it when rendering changes
+THUMBNAIL_VERSION = 1
+
+MODERN_FORMATS = [
+    fmt for fmt, feature in (("avif", "avif"), ("webp", "webp")) if features.check(feature)
+]
+CONTENT_TYPES = {"avif": "image/avif", "webp": "image/webp", "png": "image/png", "jpeg": "image/jpeg"}
+
+
+def snap_width(width: int) -> int:
+    return next((w for w in THUMBNAIL_WIDTHS if w >= width), THUMBNAIL_WIDTHS[-1])
+
+
+def negotiate_format(accept: str, original: str) -> str:
+    """The smallest format the client accepts, else the original one."""
+    for fmt in MODERN_FORMATS:
+        if CONTENT_TYPES[fmt] in accept:
+            return fmt
+    return "png" if original == "image/png" else "jpeg"
+
+
+def render(path: str, width: int, fmt: str) -> bytes:
+    """Resize an image file to `width` (never up) and encode it as `fmt`."""
+    with Image.open(path) as img:
+        if width < img.width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.Resampling.LANCZOS)
+        if fmt == "jpeg" and img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        options = {"optimize": True} if fmt == "png" else {"quality": THUMBNAIL_QUALITY}
+        img.save(out, format=fmt.upper(), **options)
+        return out.getvalue()
+
+
+_renders: dict[str, asyncio.Task] = {}
+
+
+async def get_variant(key: str, width: int, accept: str) -> CachedImage:
+    """
+    The image `key` resized for `width` in the best format `accept` allows,
+    rendered on first request and kept in the image cache. Variants are
+    addressed by the original's ETag, so a changed original gets new ones.
+    Concurrent misses for one variant share a single render.
+    """
+    original = await s3.get_image(key)
+    width = snap_width(width)
+    fmt = negotiate_format(accept, original.content_type)
+    source = original.etag.strip('"')
+    variant_key = f"variant/{source}/{THUMBNAIL_VERSION}/{width}.{fmt}"
+    variant = await asyncio.to_thread(s3.image_cache().get, variant_key)
+    if variant is None:
+        variant = await s3.shared_task(
+            _renders, variant_key, lambda: _render_variant(key, original, variant_key, width, fmt)
+        )
+    return variant
+
+
+async def _render_variant(key: str, original: CachedImage, variant_key: str, width: int, fmt: str) -> CachedImage:
+    try:
+        data = await asyncio.to_thread(render, original.path, width, fmt)
+    except FileNotFoundError:
+        # The original was evicted to make room since it was looked up
+        original = await s3.get_image(key)
+        data = await asyncio.to_thread(render, original.path, width, fmt)
+    return await asyncio.to_thread(s3.image_cache().put, variant_key, iter([data]), None, CONTENT_TYPES[fmt])
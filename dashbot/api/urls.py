@@ -0,0 +1,75 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "mc_cid",
+    "mc_eid",
+    "igshid",
+    "ocid",
+    "cmpid",
+    "ref",
+    "ref_src",
+    "smid",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "pk_")
+
+# Query parameters that select the AMP rendering of a page
+AMP_PARAMS = {"amp", "outputtype", "amp_js_v", "usqp"}
+
+
+def _is_tracking(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _strip_amp_path(path: str) -> str:
+    if path.endswith(".amp.html"):
+        return path[: -len(".amp.html")] + ".html"
+    if path.endswith(".amp"):
+        path = path[: -len(".amp")]
+    segments = [s for s in path.split("/") if s.lower() != "amp"]
+    return "/".join(segments) or "/"
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalise a url so different links to the same page compare equal:
+    lower-case scheme and host, no "www.", default port, fragment or
+    tracking parameters, sorted query and no trailing slash. AMP variants
+    (Google AMP cache, amp. hosts, /amp paths, ?amp=1) map to the page
+    they mirror.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.endswith(".cdn.ampproject.org"):
+        # https://<x>.cdn.ampproject.org/c/s/example.com/a -> https://example.com/a
+        segments = parts.path.lstrip("/").split("/")
+        secure = len(segments) > 2 and segments[1] == "s"
+        rest = "/".join(segments[2:] if secure else segments[1:])
+        if rest:
+            origin = ("https://" if secure else "http://") + rest
+            return canonical_url(origin + (f"?{parts.query}" if parts.query else ""))
+    scheme = (parts.scheme or "http").lower()
+    for prefix in ("www.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+    if parts.port and not (
+        (scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)
+    ):
+        host = f"{host}:{parts.port}"
+    path = _strip_amp_path(parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking(k) and k.lower() not in AMP_PARAMS
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import Select, func, not_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from dashbot.api.cache import CacheStats
+from dashbot.config import logger
+from dashbot.scripts.database import NewsFeed
+
+
+# Items per /hx/news-feed request; a ?limit= is capped at FEED_MAX_PAGE_SIZE
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "10"))
+FEED_MAX_PAGE_SIZE = int(os.getenv("FEED_MAX_PAGE_SIZE", "50"))
+
+# Rendered feed pages kept in memory; the TTL bounds how long writes from
+# other processes (a separate job worker, the CLI) can go unseen
+FEED_CACHE_MAX_ENTRIES = int(os.getenv("FEED_CACHE_MAX_ENTRIES", "64"))
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "30"))
+
+
+@dataclass(frozen=True)
+class FeedPage:
+    items: list[NewsFeed]
+    next_cursor: str | None
+
+
+@dataclass(frozen=True)
+class Fragment:
+    html: str
+    etag: str
+
+
+def encode_cursor(item: NewsFeed) -> str:
+    return f"{item.created_at.isoformat()}_{item.id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ValueError for anything encode_cursor did not produce."""
+    created_at, sep, id = cursor.rpartition("_")
+    if not sep:
+        raise ValueError(f"invalid feed cursor: {cursor!r}")
+    return datetime.fromisoformat(created_at), int(id)
+
+
+def feed_query(cursor: str | None, limit: int) -> Select:
+    """
+    Live items after `cursor`, newest first. Served by the partial index
+    ix_news_feed_live without a sort.
+    """
+    query = select(NewsFeed).where(NewsFeed.deleted_at.is_(None))
+    if cursor is not None:
+        query = query.where(tuple_(NewsFeed.created_at, NewsFeed.id) < decode_cursor(cursor))
+    return query.order_by(NewsFeed.created_at.desc(), NewsFeed.id.desc()).limit(limit)
+
+
+def feed_page(session: Session, cursor: str | None = None, limit: int = FEED_PAGE_SIZE) -> FeedPage:
+    """
+    One page of the feed, newest first. Keyset pagination on (created_at,
+    id): a page continues strictly after the cursor of the last one, so
+    every page costs the same however deep the reader scrolls and items
+    added in between do not shift it.
+    """
+    limit = max(1, min(limit, FEED_MAX_PAGE_SIZE))
+    # One extra row tells whether there is a next page
+    rows = list(session.scalars(feed_query(cursor, limit + 1)))
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return FeedPage(items, next_cursor)
+
+
+def feed_etag(session: Session, cursor: str | None, limit: int) -> str:
+    """
+    Strong ETag of a feed page: the newest id and the latest updated_at
+    change on every insert, like and delete. Both come from an index, so
+    revalidating costs one small query and no rendering.
+    """
+    newest_id, last_update = session.execute(
+        select(func.max(NewsFeed.id), func.max(NewsFeed.updated_at))
+    ).one()
+    raw = f"{newest_id}|{last_update}|{cursor}|{limit}"
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+class FragmentCache:
+    """
+    LRU of rendered feed fragments, keyed by the feed version they were
+    rendered at. Writes to the feed call bump(), after which older entries
+    are never served again; this includes a render that started before the
+    write and is stored after it.
+    """
+
+    def __init__(self, max_entries: int = FEED_CACHE_MAX_ENTRIES, ttl: float = FEED_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.stats = CacheStats()
+        self._entries: OrderedDict[tuple[int, Hashable], tuple[float, Fragment]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Fragment | None:
+        entry = self._entries.get((self.version, key))
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end((self.version, key))
+        self.stats.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, fragment: Fragment, version: int) -> None:
+        """Store a fragment rendered from data read at `version`."""
+        if version != self.version or self.max_entries <= 0:
+            return
+        self._entries[(version, key)] = (time.monotonic(), fragment)
+        self._entries.move_to_end((version, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def bump(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"feed fragment cache: {self.stats.hits} hits, {self.stats.misses} misses "
+            f"({self.stats.hit_rate:.0%} hit rate)"
+        )
+
+
+fragment_cache = FragmentCache()
+
+
+def bump_version() -> None:
+    """Invalidate the rendered feed after an insert, like or delete."""
+    fragment_cache.bump()
+
+
+def toggle_like(session: Session, item_id: int) -> bool | None:
+    """
+    Flip an item's like in one UPDATE ... RETURNING and commit it. The flip
+    happens in the database, so concurrent clicks never both see the old
+    state. Returns the new state, or None for an unknown item.
+    """
+    liked = session.execute(
+        update(NewsFeed)
+        .where(NewsFeed.id == item_id)
+        .values(is_liked=not_(NewsFeed.is_liked), updated_at=datetime.now())
+        .returning(NewsFeed.is_liked)
+    ).scalar_one_or_none()
+    session.commit()
+    if liked is not None:
+        bump_version()
+    return liked
@@ -0,0 +1,294 @@
+import asyncio
+import os
+import sys
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session, sessionmaker
+
+import dashbot.api.http_client as http_client
+from dashbot.config import logger
+from dashbot.scripts.database import ScrapeJob, SessionLocal
+
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+# A running job without progress for this many seconds is assumed lost
+# (e.g. the worker crashed) and goes back to the queue
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", str(30 * 60)))
+# Advisory lock key that serialises claims across worker processes
+JOB_CLAIM_LOCK = 0x6A6F6273
+
+
+def enqueue(session: Session, queries: list[str], force: bool = False) -> ScrapeJob:
+    """Queue a scrape_news run for the given search queries."""
+    job = ScrapeJob(
+        id=uuid.uuid4().hex, status="queued", queries=queries, force=force, stages={}
+    )
+    session.add(job)
+    session.commit()
+    return job
+
+
+def resume(session: Session, job: ScrapeJob) -> bool:
+    """
+    Put a failed or finished job back into the queue. It runs again under
+    the same id, so stages checkpointed by the last attempt are skipped.
+    """
+    if job.status not in ("failed", "done"):
+        return False
+    job.status = "queued"
+    job.error = None
+    job.finished_at = None
+    session.commit()
+    return True
+
+
+def lock_claims(session: Session) -> None:
+    """
+    Hold the claim lock until the session's transaction ends, so no other
+    worker reads the running jobs' queries before this claim is committed.
+    SQLite (tests) has a single writer and needs no lock.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": JOB_CLAIM_LOCK})
+
+
+def job_status(job: ScrapeJob) -> dict[str, Any]:
+    def iso(value: Any) -> str | None:
+        return value.isoformat() if value else None
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "queries": job.queries,
+        "force": job.force,
+        "stages": job.stages or {},
+        "result": job.result,
+        "error": job.error,
+        "created_at": iso(job.created_at),
+        "started_at": iso(job.started_at),
+        "finished_at": iso(job.finished_at),
+    }
+
+
+class StageWriter:
+    """
+    Progress.on_update callback that saves a job's stages in a worker
+    thread, so the event loop never waits on the database. Writes run in
+    the order the updates came in.
+    """
+
+    def __init__(self, save: Callable[[dict[str, dict[str, Any]]], None]):
+        self.save = save
+        self._last: asyncio.Task | None = None
+
+    def __call__(self, stages: dict[str, dict[str, Any]]) -> None:
+        snapshot = {name: dict(entry) for name, entry in stages.items()}
+        previous = self._last
+
+        async def write() -> None:
+            if previous is not None:
+                await previous
+            try:
+                await asyncio.to_thread(self.save, snapshot)
+            except Exception:
+                logger.exception("Could not save job progress")
+
+        self._last = asyncio.create_task(write())
+
+    async def flush(self) -> None:
+        if self._last is not None:
+            await self._last
+
+
+class Worker:
+    """
+    Runs queued jobs as asyncio tasks, at most `concurrency` at a time.
+    A job is only claimed when none of its queries belong to a job that is
+    already running, in this or any other worker process.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        concurrency: int = JOB_CONCURRENCY,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.tasks: set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._loop_task: asyncio.Task | None = None
+
+    def requeue_stale(self) -> None:
+        cutoff = datetime.now() - timedelta(seconds=JOB_STALE_AFTER)
+        with self.session_factory() as session:
+            result = session.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.status == "running", ScrapeJob.updated_at < cutoff)
+                .values(status="queued")
+            )
+            session.commit()
+        if result.rowcount:
+            logger.warning(f"Requeued {result.rowcount} stale scrape jobs")
+
+    def claim(self) -> tuple[str, list[str], bool] | None:
+        """Mark the oldest queued job without overlapping queries as running."""
+        with self.session_factory() as session:
+            lock_claims(session)
+            busy = {
+                q
+                for queries in session.scalars(
+                    select(ScrapeJob.queries).where(ScrapeJob.status == "running")
+                )
+                for q in queries
+            }
+            candidates = session.scalars(
+                select(ScrapeJob)
+                .where(ScrapeJob.status == "queued")
+                .order_by(ScrapeJob.created_at)
+                .with_for_update(skip_locked=True)
+            )
+            for job in candidates:
+                if busy & set(job.queries):
+                    continue
+                now = datetime.now()
+                job.status = "running"
+                job.started_at = now
+                job.updated_at = now
+                claimed = (job.id, list(job.queries), job.force)
+                session.commit()
+                return claimed
+            session.commit()
+        return None
+
+    def _save(self, job_id: str, **values: Any) -> None:
+        with self.session_factory() as session:
+            session.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.id == job_id)
+                .values(updated_at=datetime.now(), **values)
+            )
+            session.commit()
+
+    async def run_job(self, job_id: str, queries: list[str], force: bool) -> None:
+        # The scraper's dependencies load with the first job, not with the web app
+        import dashbot.pipeline as pipeline
+
+        writer = StageWriter(lambda stages: self._save(job_id, stages=stages))
+        progress = pipeline.Progress(on_update=writer)
+        mapping = {q: pipeline.SEARCH_QUERIES.get(q, pipeline.BAVARIAN_PIC) for q in queries}
+        logger.info(f"Starting scrape job {job_id} for {len(queries)} queries")
+        try:
+            result = await pipeline.scrape_news(mapping, force, progress, run_id=job_id)
+        except asyncio.CancelledError:
+            # Shutting down: keep the last progress and hand the job back to
+            # the queue, shielded so stopping cannot cut the writes short
+            async def requeue() -> None:
+                await writer.flush()
+                await asyncio.to_thread(self._save, job_id, status="queued")
+
+            await asyncio.shield(requeue())
+            raise
+        except Exception as e:
+            logger.exception(f"Scrape job {job_id} failed")
+            await writer.flush()
+            await asyncio.to_thread(
+                self._save, job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=datetime.now()
+            )
+        else:
+            await writer.flush()
+            await asyncio.to_thread(self._save, job_id, status="done", result=result, finished_at=datetime.now())
+            logger.info(f"Finished scrape job {job_id}")
+
+    def wake(self) -> None:
+        """Check the queue now instead of at the next poll."""
+        self._wake.set()
+
+    async def run(self) -> None:
+        # Database calls run in threads: the worker shares the loop with the web app
+        await asyncio.to_thread(self.requeue_stale)
+        while not self._stopping:
+            self._wake.clear()
+            while len(self.tasks) < self.concurrency:
+                claimed = await asyncio.to_thread(self.claim)
+                if claimed is None:
+                    break
+                task = asyncio.create_task(self.run_job(*claimed))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+                task.add_done_callback(lambda _: self.wake())
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._loop_task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self.wake()
+        for task in list(self.tasks):
+            task.cancel()
+        tasks = [*self.tasks, *([self._loop_task] if self._loop_task else [])]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_worker: Worker | None = None
+
+
+def start_worker() -> Worker:
+    global _worker
+    if _worker is None:
+        _worker = Worker()
+        _worker.start()
+    return _worker
+
+
+async def stop_worker() -> None:
+    global _worker
+    if _worker is None:
+        return
+    worker, _worker = _worker, None
+    await worker.stop()
+
+
+def wake() -> None:
+    if _worker is not None:
+        _worker.wake()
+
+
+async def close_scrapers() -> None:
+    """Close the LLM client and parser pool, if a scrape loaded them."""
+    if "dashbot.pipeline" not in sys.modules:
+        return
+    import dashbot.api.cse as cse
+    import dashbot.api.llm as llm
+
+    await llm.close()
+    cse.close_parse_pool()
+
+
+async def main() -> None:
+    """Run a standalone worker process: python -m dashbot.jobs"""
+    import dashbot.api.cse as cse
+
+    cse.use_parse_processes()
+    async with http_client.session():
+        start_worker()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await stop_worker()
+            await close_scrapers()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
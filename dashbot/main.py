@@ -1,25 +1,42 @@
-import asyncio
-from collections.abc import Generator
-from fastapi import FastAPI, Request, Form, Depends
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends, Query
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, Response
-import base64
-import boto3
-from botocore.exceptions import ClientError
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 
-from typing import Any
 import os
-from googleapiclient.discovery import build
-from newspaper import Article
 # Database
-from dashbot.scripts.database import SessionLocal, NewsFeed
-import dashbot.api.cse as cse
-import dashbot.api.ai as ai
-from sqlalchemy.orm import Session
+from dashbot.scripts.database import AsyncSessionLocal, ScrapeJob
+import dashbot.api.http_client as http_client
+import dashbot.api.s3 as s3
+import dashbot.feed as feed
+import dashbot.jobs as jobs
+from sqlalchemy.ext.asyncio import AsyncSession
 from dashbot.config import logger
 
-app = FastAPI()
+# Run queued scrape jobs inside the web process; set JOB_WORKER=0 when a
+# separate `python -m dashbot.jobs` process does it
+JOB_WORKER = os.getenv("JOB_WORKER", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One pooled HTTP client for all outbound calls of this process
+    await http_client.start()
+    if JOB_WORKER:
+        jobs.start_worker()
+    try:
+        yield
+    finally:
+        await jobs.stop_worker()
+        await http_client.close()
+        await jobs.close_scrapers()
+        feed.fragment_cache.log_stats()
+        s3.log_stats()
+
+
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="dashbot/static"), name="static")
 templates = Jinja2Templates(directory="dashbot/templates")
 
@@ -30,12 +47,28 @@ async def home(request: Request):
     return templates.TemplateResponse("base.html", context)
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
+# The feed changes at any time: always revalidate, the ETag makes it cheap.
+# Image keys are never reused for other content, so images are kept a day.
+FEED_CACHE_CONTROL = "private, no-cache"
+IMAGE_CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "public, max-age=86400")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match comparison, weak as RFC 9110 asks for GET."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    # Async sessions, so a slow query does not stall the other requests.
+    # Sync helpers (feed queries, jobs) run on them through run_sync.
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 @app.get("/news", response_class=HTMLResponse)
@@ -46,170 +79,131 @@ async def news(request: Request):
 
 
 @app.get("/hx/news-feed", response_class=HTMLResponse)
-async def hx_news_feed(request: Request, db: Session = Depends(get_db)):
-    # Query recent items (not deleted), newest first
-    rows = (
-        db.query(NewsFeed)
-        .filter(NewsFeed.deleted_at.is_(None))
-        .order_by(NewsFeed.created_at.desc())
-        .limit(50)
-        .all()
-    )
-    # Pass rows as items; template will handle rendering
-    context = {"request": request, "items": rows}
-    return templates.TemplateResponse("partials/news_items.html", context)
+async def hx_news_feed(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(feed.FEED_PAGE_SIZE, gt=0),
+    db: AsyncSession = Depends(get_db),
+):
+    # Recent items (not deleted), newest first, one page per request; the
+    # first page comes with the list around it, later ones are appended.
+    # Rendered pages are served from memory until the feed changes, and
+    # browsers revalidate them with If-None-Match. The limit is capped
+    # before it goes into the key, so ?limit=51, 52, ... share one entry.
+    limit = min(limit, feed.FEED_MAX_PAGE_SIZE)
+    key = (cursor, limit)
+    fragment = feed.fragment_cache.get(key)
+    if fragment is None:
+        version = feed.fragment_cache.version
+        try:
+            if cursor:
+                feed.decode_cursor(cursor)
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+        etag = await db.run_sync(feed.feed_etag, cursor, limit)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": FEED_CACHE_CONTROL})
+        page = await db.run_sync(feed.feed_page, cursor, limit)
+        context = {"request": request, "items": page.items, "next_cursor": page.next_cursor, "limit": limit}
+        template = "partials/news_page.html" if cursor else "partials/news_items.html"
+        fragment = feed.Fragment(templates.get_template(template).render(context), etag)
+        feed.fragment_cache.set(key, fragment, version)
+    headers = {"ETag": fragment.etag, "Cache-Control": FEED_CACHE_CONTROL}
+    if _etag_matches(request, fragment.etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(fragment.html, headers=headers)
 
 
 @app.post("/toggle-like/{item_id}", response_class=HTMLResponse)
 async def toggle_like(
     request: Request,
     item_id: int,
-    is_liked: bool = Form(False),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    # Flip the state; here you'd persist to DB and return the new state
-    print("inside toggle like post func")
-    item = db.query(NewsFeed).filter(NewsFeed.id == item_id).first()
-    if not item:
+    # Flipped in the database, the state the page showed is not trusted
+    is_liked = await db.run_sync(feed.toggle_like, item_id)
+    if is_liked is None:
         return JSONResponse(status_code=404, content={"error": "Item not found"})
-    item.is_liked = not is_liked
-    db.commit()
-    db.refresh(item)
 
     return templates.TemplateResponse(
         "partials/like_button.html",
-        {"request": request, "item": {"id": item_id, "is_liked": item.is_liked}},
+        {"request": request, "item": {"id": item_id, "is_liked": is_liked}},
     )
 
 
 @app.get("/image/{image_key}")
-async def get_s3_image(image_key: str):
+async def get_s3_image(request: Request, image_key: str, w: int | None = Query(None, gt=0)):
     """
-    Fetch image from S3 bucket and return as base64 data URL
+    Serve an image from the local image cache, fetched from S3 on a miss,
+    with its S3 ETag. A matching If-None-Match is answered with 304. With
+    ?w= a resized variant in the best format the Accept header allows is
+    served instead.
     """
     try:
-        # Initialize S3 client
-        s3_client = boto3.client('s3')
-        
-        # Fetch the image from S3
-        bucket_name = "website-dashbot"
-        object_key = f"news-images/{image_key}"
-        
-        logger.info(f"Attempting to fetch image from S3: bucket={bucket_name}, key={object_key}")
-        
-        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-        image_data = response['Body'].read()
-        
-        logger.info(f"Successfully fetched image: {len(image_data)} bytes")
-        
-        # Determine content type based on file extension
-        content_type = "image/jpeg"  # default
-        if image_key.lower().endswith('.png'):
-            content_type = "image/png"
-        elif image_key.lower().endswith('.gif'):
-            content_type = "image/gif"
-        elif image_key.lower().endswith('.webp'):
-            content_type = "image/webp"
-        
-        logger.info(f"Returning image as {content_type}")
-        return Response(content=image_data, media_type=content_type)
-        
-    except ClientError as e:
-        logger.error(f"Error fetching image from S3: {e}")
-        logger.error(f"Failed to fetch: bucket={bucket_name}, key={object_key}")
-        # Return a placeholder image or error
-        return Response(content="data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTAiIGhlaWdodD0iNTAiIHZpZXdCb3g9IjAgMCA1MCA1MCIgZmlsbD0ibm9uZSIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj4KPHJlY3Qgd2lkdGg9IjUwIiBoZWlnaHQ9IjUwIiBmaWxsPSIjRjNGNEY2Ii8+CjxwYXRoIGQ9Ik0yNSAyNUMzMC41MjI4IDI1IDM1IDIwLjUyMjggMzUgMTVDMzUgOS40NzcxNSAzMC41MjI4IDUgMjUgNUMxOS40NzcxIDUgMTUgOS40NzcxNSAxNSAxNUMxNSAyMC41MjI4IDE5LjQ3NzEgMjUgMjUgMjVaIiBmaWxsPSIjOUNBM0FGIi8+CjxwYXRoIGQ9Ik0yNSAzMEMyNy43NjE0IDMwIDMwIDI3Ljc2MTQgMzAgMjVDMzAgMjIuMjM4NiAyNy43NjE0IDIwIDI1IDIwQzIyLjIzODYgMjAgMjAgMjIuMjM4NiAyMCAyNUMyMCAyNy43NjE0IDIyLjIzODYgMzAgMjUgMzBaIiBmaWxsPSIjNjM2NkY3Ii8+Cjwvc3ZnPgo=", media_type="text/plain")
+        if w is None:
+            image = await s3.get_image(image_key)
+        else:
+            import dashbot.api.thumbnails as thumbnails
+
+            image = await thumbnails.get_variant(image_key, w, request.headers.get("accept", ""))
+        headers = {"ETag": image.etag, "Cache-Control": IMAGE_CACHE_CONTROL}
+        if w is not None:
+            headers["Vary"] = "Accept"
+        if _etag_matches(request, image.etag):
+            return Response(status_code=304, headers=headers)
+        # Opened here, before the response starts, so a file evicted while
+        # it is being sent is still served whole
+        body = s3.stream(image)
     except Exception as e:
-        logger.error(f"Unexpected error fetching image: {e}")
-        logger.error(f"Failed to fetch: bucket={bucket_name}, key={object_key}")
-        return Response(content="data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTAiIGhlaWdodD0iNTAiIHZpZXdCb3g9IjAgMCA1MCA1MCIgZmlsbD0ibm9uZSIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj4KPHJlY3Qgd2lkdGg9IjUwIiBoZWlnaHQ9IjUwIiBmaWxsPSIjRjNGNEY2Ii8+CjxwYXRoIGQ9Ik0yNSAyNUMzMC41MjI4IDI1IDM1IDIwLjUyMjggMzUgMTVDMzUgOS40NzcxNSAzMC41MjI4IDUgMjUgNUMxOS40NzcxIDUgMTUgOS40NzcxNSAxNSAxNUMxNSAyMC41MjI4IDE5LjQ3NzEgMjUgMjUgMjVaIiBmaWxsPSIjOUNBM0FGIi8+CjxwYXRoIGQ9Ik0yNSAzMEMyNy43NjE0IDMwIDMwIDI3Ljc2MTQgMzAgMjVDMzAgMjIuMjM4NiAyNy43NjE0IDIwIDI1IDIwQzIyLjIzODYgMjAgMjAgMjIuMjM4NiAyMCAyNUMyMCAyNy43NjE0IDIyLjIzODYgMzAgMjUgMzBaIiBmaWxsPSIjNjM2NkY3Ii8+Cjwvc3ZnPgo=", media_type="text/plain")
-
-
-BAVARIAN_PIC = "bavarian_landscape_20250918_210807.png"
-HACKER_PIC = "hacker_20250918_212113.png"
-TENNIS_PIC = "tennis_20250918_212632.png"
-STARTUP_PIC = "startup_20250918_213550.png"
-BOOKS_PIC = "books_20250918_215804.png"
-BODYBUILDING_PIC = "harry-potter-ai-video.png"
-CLIMATE_PIC = "climate_20250918_223129.png"
-
-
-# Search for German news
-# in the future this should be set on the website by the client
-SEARCH_QUERIES = {
-    # "deutsche nachrichten heute": BAVARIAN_PIC,
-    # "climate change news": CLIMATE_PIC,
-    # "globe aufwärmung nachrichten": CLIMATE_PIC,
-    
-    # "climate change news": CLIMATE_PIC,
-    # "globe aufwärmung nachrichten": CLIMATE_PIC,
-    # "klimatförändring nyheter": CLIMATE_PIC,
-    # "energy news": CLIMATE_PIC,
-    # "energy news in sweden": CLIMATE_PIC,
-    # "energy news in germany": CLIMATE_PIC,
-    # "hacker news": HACKER_PIC,
-    "software development news": HACKER_PIC,
-    # "ai news": HACKER_PIC,
-    # "german news": BAVARIAN_PIC,
-    # "deutschland aktuell": BAVARIAN_PIC,
-    # "tennis news": TENNIS_PIC,
-    # "upcoming tennis tournaments news": TENNIS_PIC,
-    # "best tennis players news": TENNIS_PIC,
-    # "htmx news": HACKER_PIC,
-    # "python news": HACKER_PIC,
-    # "tailwindcss and daisyui news": HACKER_PIC,
-    # "ai python tools and libraries news": HACKER_PIC,
-    # "startups in europe news": STARTUP_PIC,
-    # "startups in germany news": STARTUP_PIC,
-    # "startups in sweden news": STARTUP_PIC,
-    # "startups in munich news": STARTUP_PIC,
-    # "top bestselling books today": BOOKS_PIC,
-    # "bestselling books today": BOOKS_PIC,
-    # "best new sci-fi and fantasy books": BOOKS_PIC,
-    # "Bestseller Bücher in Deutschland": BOOKS_PIC,
-    # "Health science news": BODYBUILDING_PIC,
-    # "Diet science news": BOOKS_PIC,
-    # "Muscle building science news": BODYBUILDING_PIC,
-}
+        logger.error(f"Error fetching image: {e}")
+        logger.error(f"Failed to fetch: bucket={s3.S3_BUCKET}, key={image_key}")
+        return Response(content="data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTAiIGhlaWdodD0iNTAiIHZpZXdCb3g9IjAgMCA1MCA1MCIgZmlsbD0ibm9uZSIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj4KPHJlY3Qgd2lkdGg9IjUwIiBoZWlnaHQ9IjUwIiBmaWxsPSIjRjNGNEY2Ii8+CjxwYXRoIGQ9Ik0yNSAyNUMzMC41MjI4IDI1IDM1IDIwLjUyMjggMzUgMTVDMzUgOS40NzcxNSAzMC41MjI4IDUgMjUgNUMxOS40NzcxIDUgMTUgOS40NzcxNSAxNSAxNUMxNSAyMC41MjI4IDE5LjQ3NzEgMjUgMjUgMjVaIiBmaWxsPSIjOUNBM0FGIi8+CjxwYXRoIGQ9Ik0yNSAzMEMyNy43NjE0IDMwIDMwIDI3Ljc2MTQgMzAgMjVDMzAgMjIuMjM4NiAyNy43NjE0IDIwIDI1IDIwQzIyLjIzODYgMjAgMjAgMjIuMjM4NiAyMCAyNUMyMCAyNy43NjE0IDIyLjIzODYgMzAgMjUgMzBaIiBmaWxsPSIjNjM2NkY3Ii8+Cjwvc3ZnPgo=", media_type="text/plain", headers={"Cache-Control": "no-store"})
+
+    headers["Content-Length"] = str(image.size)
+    return StreamingResponse(body, media_type=image.content_type, headers=headers)
 
 
 @app.post("/scrape-news")
-async def scrape_news() -> JSONResponse:
+async def scrape_news(
+    force: bool = False,
+    query: list[str] | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+) -> JSONResponse:
     """
-    Endpoint to scrape German news using Google Custom Search API and newspaper3k.
-    This endpoint will be triggered daily via AWS EventBridge.
-    Save personalized news to db.
-
-    1. Search with CSE -> articles
-    2. AI filter -> return groups ids of articles per topic
-    3. AI research facts and counter arguments -> more articles + ids per topic
-    4. Get full context (articles per topic), let ai write summary -> save to db
+    Queue a news scrape (see dashbot.pipeline.scrape_news) and return its
+    job id right away. This endpoint will be triggered daily via AWS
+    EventBridge. `query` restricts the run to some search queries, `force`
+    re-summarises pages that were already used.
     """
-    pages_nested = await asyncio.gather(*(cse.search_google(q) for q in SEARCH_QUERIES.keys()))
-    pages = [p for sub in pages_nested for p in (sub or [])]
-    topics = ai.generate_topics(pages)
-    topics = ai.personalize_topics(topics)
-    for topic in topics:
-        p = ai.get_pages_per_topic(pages, topic)
-        context = ""
-        source = ""
-        query = BAVARIAN_PIC
-        if len(topic.pages) > 0:
-            query = pages[topic.pages[0]].query
-        for page in p:
-            source += page.source + "\n"
-            try:
-                article = cse.extract_article(page)
-            except Exception as e:
-                logger.error(f"Error extracting article: {e}\n Page: {page}")
-                continue
-            context += page.title + "\n" + article.content
-        if not context:
-            logger.error(f"No context found for topic: {topic.topic}")
-            continue
-        summary = ai.generate_summary(context)
-        ai.add_news_to_database(summary, source, topic.topic, SEARCH_QUERIES[query])
-    return JSONResponse(status_code=200, content={"message": "News scraped successfully"})
+    import dashbot.pipeline as pipeline
+
+    job = await db.run_sync(jobs.enqueue, query or list(pipeline.SEARCH_QUERIES), force)
+    jobs.wake()
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "status_url": f"/scrape-news/{job.id}"},
+    )
+
+
+@app.get("/scrape-news/{job_id}")
+async def scrape_news_status(job_id: str, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    """Status of a scrape job with per-stage progress and timings."""
+    job = await db.get(ScrapeJob, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return JSONResponse(status_code=200, content=jobs.job_status(job))
+
+
+@app.post("/scrape-news/{job_id}/resume")
+async def resume_scrape_news(job_id: str, db: AsyncSession = Depends(get_db)) -> JSONResponse:
+    """Queue a failed job again; it continues after its last completed stage."""
+    job = await db.get(ScrapeJob, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    if not await db.run_sync(jobs.resume, job):
+        return JSONResponse(status_code=409, content={"error": f"Job is {job.status}"})
+    jobs.wake()
+    return JSONResponse(status_code=202, content=jobs.job_status(job))
 
 """
 So now the frontend is working. Like we have a feed and everything.
@@ -229,4 +223,8 @@ And also we extract the info from the websites. So we do have the whole
 content already.
 """
 if __name__ == "__main__":
-    asyncio.run(scrape_news())
\ No newline at end of file
+    # The one-off scrape lives with the pipeline now, so the web app does
+    # not load the scraper; this keeps `python -m dashbot.main` working
+    from dashbot.pipeline import cli
+
+    cli()
@@ -0,0 +1,353 @@
+import argparse
+import asyncio
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import delete
+from sqlalchemy.orm import sessionmaker
+
+import dashbot.api.ai as ai
+import dashbot.api.context as context_builder
+import dashbot.api.cse as cse
+import dashbot.api.dedup as dedup
+import dashbot.api.http_client as http_client
+import dashbot.api.llm as llm
+import dashbot.api.seen as seen
+import dashbot.store as store
+from dashbot.api.scheduler import scheduler
+from dashbot.config import logger
+from dashbot.scripts.database import PipelineCheckpoint, SessionLocal
+
+
+BAVARIAN_PIC = "bavarian_landscape_20250918_210807.png"
+HACKER_PIC = "hacker_20250918_212113.png"
+TENNIS_PIC = "tennis_20250918_212632.png"
+STARTUP_PIC = "startup_20250918_213550.png"
+BOOKS_PIC = "books_20250918_215804.png"
+BODYBUILDING_PIC = "harry-potter-ai-video.png"
+CLIMATE_PIC = "climate_20250918_223129.png"
+
+
+# Search for German news
+# in the future this should be set on the website by the client
+SEARCH_QUERIES = {
+    # "deutsche nachrichten heute": BAVARIAN_PIC,
+    # "climate change news": CLIMATE_PIC,
+    # "globe aufwärmung nachrichten": CLIMATE_PIC,
+    
+    # "climate change news": CLIMATE_PIC,
+    # "globe aufwärmung nachrichten": CLIMATE_PIC,
+    # "klimatförändring nyheter": CLIMATE_PIC,
+    # "energy news": CLIMATE_PIC,
+    # "energy news in sweden": CLIMATE_PIC,
+    # "energy news in germany": CLIMATE_PIC,
+    # "hacker news": HACKER_PIC,
+    "software development news": HACKER_PIC,
+    # "ai news": HACKER_PIC,
+    # "german news": BAVARIAN_PIC,
+    # "deutschland aktuell": BAVARIAN_PIC,
+    # "tennis news": TENNIS_PIC,
+    # "upcoming tennis tournaments news": TENNIS_PIC,
+    # "best tennis players news": TENNIS_PIC,
+    # "htmx news": HACKER_PIC,
+    # "python news": HACKER_PIC,
+    # "tailwindcss and daisyui news": HACKER_PIC,
+    # "ai python tools and libraries news": HACKER_PIC,
+    # "startups in europe news": STARTUP_PIC,
+    # "startups in germany news": STARTUP_PIC,
+    # "startups in sweden news": STARTUP_PIC,
+    # "startups in munich news": STARTUP_PIC,
+    # "top bestselling books today": BOOKS_PIC,
+    # "bestselling books today": BOOKS_PIC,
+    # "best new sci-fi and fantasy books": BOOKS_PIC,
+    # "Bestseller Bücher in Deutschland": BOOKS_PIC,
+    # "Health science news": BODYBUILDING_PIC,
+    # "Diet science news": BOOKS_PIC,
+    # "Muscle building science news": BODYBUILDING_PIC,
+}
+
+
+class Progress:
+    """
+    Status and timing of each stage of a pipeline run. `on_update` is
+    called with the stages dict whenever a stage starts or finishes, so a
+    job can persist it for the status endpoint.
+    """
+
+    def __init__(self, on_update: Callable[[dict[str, dict[str, Any]]], None] | None = None):
+        self.stages: dict[str, dict[str, Any]] = {}
+        self.on_update = on_update
+
+    def _notify(self) -> None:
+        if self.on_update is not None:
+            self.on_update(self.stages)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[dict[str, Any]]:
+        """Track a stage; the yielded dict takes extra details such as counts."""
+        entry: dict[str, Any] = {
+            "status": "running",
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.stages[name] = entry
+        self._notify()
+        start = time.perf_counter()
+        try:
+            yield entry
+        except BaseException:
+            entry["status"] = "failed"
+            raise
+        else:
+            entry["status"] = "done"
+        finally:
+            entry["seconds"] = round(time.perf_counter() - start, 3)
+            self._notify()
+
+
+class Checkpoints:
+    """
+    Outputs of the finished stages of one run, stored in the
+    pipeline_checkpoint table under the run id. A run started again with
+    the same id loads them instead of repeating network and LLM work.
+    Without a run id nothing is stored. Payloads can be large (the text of
+    every article), so reads and writes run in a worker thread.
+    """
+
+    def __init__(self, run_id: str | None, session_factory: sessionmaker | None = None):
+        self.run_id = run_id
+        self.session_factory = session_factory or SessionLocal
+
+    async def load(self, stage: str) -> Any | None:
+        if self.run_id is None:
+            return None
+        return await asyncio.to_thread(self._load, stage)
+
+    def _load(self, stage: str) -> Any | None:
+        with self.session_factory() as session:
+            row = session.get(PipelineCheckpoint, (self.run_id, stage))
+            return row.payload if row is not None else None
+
+    async def save(self, stage: str, payload: Any) -> None:
+        if self.run_id is None:
+            return
+        await asyncio.to_thread(self._save, stage, payload)
+
+    def _save(self, stage: str, payload: Any) -> None:
+        with self.session_factory() as session:
+            session.merge(PipelineCheckpoint(run_id=self.run_id, stage=stage, payload=payload))
+            session.commit()
+
+    async def clear(self) -> None:
+        if self.run_id is None:
+            return
+        await asyncio.to_thread(self._clear)
+
+    def _clear(self) -> None:
+        with self.session_factory() as session:
+            session.execute(delete(PipelineCheckpoint).where(PipelineCheckpoint.run_id == self.run_id))
+            session.commit()
+
+
+@dataclass(frozen=True)
+class Story:
+    topic: ai.Topic
+    context: str
+    source: str
+    image: str
+    urls: list[str]
+
+
+async def search_stage(queries: dict[str, str], force: bool) -> list[cse.GoogleCSE]:
+    pages_nested = await asyncio.gather(*(cse.search_google(q) for q in queries.keys()))
+    pages = [p for sub in pages_nested for p in (sub or [])]
+    cse.search_cache().log_stats()
+    # Topic ids index into the deduplicated list from here on. SimHash over
+    # every page is CPU bound, so it runs in a thread like the clustering
+    pages = await asyncio.to_thread(dedup.dedupe_pages, pages)
+    if not force:
+        pages = await asyncio.to_thread(_filter_unseen, pages)
+    return pages
+
+
+def _filter_unseen(pages: list[cse.GoogleCSE]) -> list[cse.GoogleCSE]:
+    with SessionLocal() as db:
+        return seen.filter_unseen(db, pages)
+
+
+async def topics_stage(pages: list[cse.GoogleCSE]) -> list[ai.Topic]:
+    if ai.TOPIC_MODE == "local":
+        topics = await ai.generate_topics_local(pages)
+    else:
+        topics = await ai.generate_topics(pages)
+    return ai.personalize_topics(topics)
+
+
+def build_stories(
+    queries: dict[str, str],
+    pages: list[cse.GoogleCSE],
+    topics: list[ai.Topic],
+    articles: dict[cse.GoogleCSE, cse.WebArticle | None],
+) -> list[Story]:
+    """Assemble the summary context of every topic from its extracted articles."""
+    stories = []
+    for topic in topics:
+        p = ai.get_pages_per_topic(pages, topic)
+        docs = []
+        source = ""
+        query = ""
+        if len(topic.pages) > 0:
+            query = pages[topic.pages[0]].query
+        for page in p:
+            source += page.source + "\n"
+            article = articles.get(page)
+            if article is None:
+                continue
+            docs.append((page.title, article.content))
+        if not docs:
+            logger.error(f"No context found for topic: {topic.topic}")
+            continue
+        # Rank and trim passages so the prompt stays within the token budget
+        context = context_builder.build_context(topic.topic, docs)
+        used = [page.url for page in p if articles.get(page) is not None]
+        stories.append(Story(topic, context, source, queries.get(query, BAVARIAN_PIC), used))
+    return stories
+
+
+def _dump_article(article: cse.WebArticle | None) -> dict[str, Any] | None:
+    if article is None:
+        return None
+    return {k: v for k, v in asdict(article).items() if k != "google_cse"}
+
+
+async def scrape_news(
+    queries: dict[str, str] | None = None,
+    force: bool = False,
+    progress: Progress | None = None,
+    run_id: str | None = None,
+) -> dict[str, Any]:
+    """
+    Scrape news using Google Custom Search API and newspaper3k and save
+    personalized news to db. Pages that already went into a summary are
+    skipped unless `force` is set. `queries` maps search queries to the
+    picture of their topic and defaults to SEARCH_QUERIES. With a `run_id`
+    every stage output is checkpointed, and running the same id again
+    resumes after the last completed stage.
+
+    1. Search with CSE -> articles
+    2. AI filter -> return groups ids of articles per topic
+    3. AI research facts and counter arguments -> more articles + ids per topic
+    4. Get full context (articles per topic), let ai write summary -> save to db
+    """
+    queries = queries or SEARCH_QUERIES
+    progress = progress or Progress()
+    checkpoints = Checkpoints(run_id)
+    store_run_id = run_id or uuid.uuid4().hex
+
+    with progress.stage("search") as stage:
+        saved = await checkpoints.load("search")
+        if saved is not None:
+            pages = [cse.GoogleCSE(**p) for p in saved]
+            stage["resumed"] = True
+        else:
+            pages = await search_stage(queries, force)
+            await checkpoints.save("search", [asdict(p) for p in pages])
+        stage["pages"] = len(pages)
+    if not pages:
+        await checkpoints.clear()
+        return {"message": "No new pages to summarise", "news_feed_ids": []}
+
+    with progress.stage("topics") as stage:
+        saved = await checkpoints.load("topics")
+        if saved is not None:
+            topics = [ai.Topic(**t) for t in saved]
+            stage["resumed"] = True
+        else:
+            topics = await topics_stage(pages)
+            await checkpoints.save("topics", [asdict(t) for t in topics])
+        stage["topics"] = len(topics)
+
+    with progress.stage("extract") as stage:
+        # Extract every page of every selected topic in one concurrent pass
+        selected = list(dict.fromkeys(id for t in topics for id in t.pages if 0 <= id < len(pages)))
+        saved = await checkpoints.load("extract")
+        if saved is not None:
+            extracted = [
+                cse.WebArticle(**a, google_cse=pages[id]) if a is not None else None
+                for id, a in zip(selected, saved)
+            ]
+            stage["resumed"] = True
+        else:
+            extracted = await cse.extract_articles([pages[id] for id in selected])
+            await checkpoints.save("extract", [_dump_article(a) for a in extracted])
+            stage["fetch"] = scheduler.stats()
+        articles = {pages[id]: a for id, a in zip(selected, extracted)}
+        stage["articles"] = sum(a is not None for a in extracted)
+        stage["failed"] = sum(a is None for a in extracted)
+
+    # Tokenising every article is CPU bound: keep it off the loop the web app uses
+    stories = await asyncio.to_thread(build_stories, queries, pages, topics, articles)
+
+    with progress.stage("summarise") as stage:
+        # Summarise all topics in parallel; on resume only the missing ones
+        summaries: list[str | None] = await checkpoints.load("summarise") or [None] * len(stories)
+        missing = [i for i, s in enumerate(summaries) if s is None]
+        stage["resumed"] = len(missing) < len(stories)
+        if missing:
+            generated = await ai.generate_summaries([stories[i].context for i in missing])
+            for i, summary in zip(missing, generated):
+                summaries[i] = summary
+            await checkpoints.save("summarise", summaries)
+        stage["summaries"] = sum(s is not None for s in summaries)
+
+    with progress.stage("store") as stage:
+        # One transaction for the whole run; items are upserted on
+        # (run id, title), so a resumed run never duplicates them
+        items = []
+        for story, summary in zip(stories, summaries):
+            if summary is None:
+                logger.error(f"No summary generated for topic: {story.topic.topic}")
+                continue
+            items.append(
+                store.NewsItem(
+                    title=story.topic.topic,
+                    content=summary,
+                    source=story.source,
+                    image=story.image,
+                    urls=story.urls,
+                )
+            )
+        stored = await asyncio.to_thread(store.store_news, items, run_id=store_run_id)
+        ids = list(stored.values())
+        stage["news_items"] = len(ids)
+
+    if all(s is not None for s in summaries):
+        await checkpoints.clear()
+    return {"message": "News scraped successfully", "news_feed_ids": ids}
+
+
+async def main(force: bool = False, run_id: str | None = None) -> None:
+    """Run the pipeline once in this process, without the job queue."""
+    async with http_client.session():
+        try:
+            await scrape_news(force=force, run_id=run_id)
+        finally:
+            await llm.close()
+            cse.close_parse_pool()
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Run the news pipeline once")
+    parser.add_argument("--force", action="store_true", help="re-summarise already used pages")
+    parser.add_argument("--run-id", help="checkpoint under this id, resume it if it exists")
+    args = parser.parse_args()
+    cse.use_parse_processes()
+    asyncio.run(main(force=args.force, run_id=args.run_id))
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,6 +1,11 @@
 import datetime
+import functools
 import os
-from sqlalchemy import DateTime, create_engine, Integer, String, TIMESTAMP, func, ARRAY
+from collections.abc import Callable
+from typing import Any
+from sqlalchemy import DateTime, ForeignKey, Index, create_engine, Integer, String, TIMESTAMP, func, ARRAY, JSON, Boolean, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 from sqlalchemy.orm import Mapped, mapped_column, sessionmaker, Session
@@ -13,23 +18,80 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 
+# Pool sizing per engine and process. Connections are pinged on checkout,
+# so ones Aurora dropped (failover, idle timeout) are replaced silently.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+# Prepared statements cached per asyncpg connection; 0 behind pgbouncer
+# in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "500"))
 
-# Safety check
-required_vars = ["DB_HOST", "DB_NAME", "DB_USER", "DB_PASSWORD"]
-missing = [var for var in required_vars if not os.environ.get(var)]
-if missing:
-    raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
+_pool_options: dict[str, Any] = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": True,
+}
 
-DATABASE_URL = (
-    f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+
+def database_url(driver: str = "psycopg2") -> str:
+    """The application's database url; the settings are checked here, not on import."""
+    required_vars = ["DB_HOST", "DB_NAME", "DB_USER", "DB_PASSWORD"]
+    missing = [var for var in required_vars if not os.environ.get(var)]
+    if missing:
+        raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
+    return f"postgresql+{driver}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+
+@functools.cache
+def get_engine() -> Engine:
+    """The psycopg2 engine of the scraper and the scripts, created on first use."""
+    return create_engine(database_url(), **_pool_options)
+
+
+@functools.cache
+def get_async_engine() -> AsyncEngine:
+    """The asyncpg engine of the request handlers, created on first use."""
+    return create_async_engine(
+        database_url("asyncpg"),
+        connect_args={
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+        **_pool_options,
+    )
+
+
+class _BindOnFirstUse:
+    """Session factory that asks for its engine only when the first session is made."""
+
+    def __init__(self, get_bind: Callable[[], Any], **kw: Any):
+        super().__init__(**kw)
+        self._get_bind = get_bind
+
+    def __call__(self, **local_kw: Any) -> Any:
+        if "bind" not in local_kw and self.kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+
+class LazySessionmaker(_BindOnFirstUse, sessionmaker):
+    pass
+
+
+class LazyAsyncSessionmaker(_BindOnFirstUse, async_sessionmaker):
+    pass
 
 
-engine = create_engine(DATABASE_URL)
 Base = declarative_base()
 
 # Session factory for runtime queries
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+SessionLocal = LazySessionmaker(get_engine, autoflush=False, autocommit=False)
+# Async sessions for the FastAPI handlers; objects stay usable after commit
+AsyncSessionLocal = LazyAsyncSessionmaker(get_async_engine, autoflush=False, expire_on_commit=False)
 
 
 class NewsFeed(Base):
@@ -41,9 +103,48 @@ class NewsFeed(Base):
     image: Mapped[str] = mapped_column(String)
     score: Mapped[int | None] = mapped_column(Integer, nullable=True)
     feedback: Mapped[str | None] = mapped_column(String, nullable=True)
+    is_liked: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text("false"))
+    # Pipeline run that wrote the item, unique together with the title
+    run_id: Mapped[str | None] = mapped_column(String, nullable=True)
     created_at: Mapped[DateTime] = mapped_column(TIMESTAMP, server_default=func.now())
+    # Bumped by every ORM update, the feed ETag is derived from it
+    updated_at: Mapped[DateTime | None] = mapped_column(
+        TIMESTAMP,
+        nullable=True,
+        default=datetime.datetime.now,
+        server_default=func.now(),
+        onupdate=datetime.datetime.now,
+    )
     deleted_at: Mapped[DateTime | None] = mapped_column(TIMESTAMP, nullable=True)
 
+    # Partial indexes over live rows only, kept in step with
+    # dashbot.scripts.migrations which creates them on existing databases
+    __table_args__ = (
+        Index(
+            "ix_news_feed_live",
+            created_at.desc(),
+            id.desc(),
+            postgresql_where=deleted_at.is_(None),
+            sqlite_where=deleted_at.is_(None),
+        ),
+        Index(
+            "ix_news_feed_liked",
+            created_at.desc(),
+            id.desc(),
+            postgresql_where=is_liked & deleted_at.is_(None),
+            sqlite_where=is_liked & deleted_at.is_(None),
+        ),
+        Index(
+            "ix_news_feed_score",
+            score.desc(),
+            id.desc(),
+            postgresql_where=deleted_at.is_(None),
+            sqlite_where=deleted_at.is_(None),
+        ),
+        Index("ix_news_feed_updated", updated_at),
+        Index("ux_news_feed_run_title", run_id, title, unique=True),
+    )
+
 
 class ContextRules(Base):
     __tablename__ = "context_rules"
@@ -51,19 +152,57 @@ class ContextRules(Base):
     importance: Mapped[int | None] = mapped_column(Integer, nullable=True)
     rule: Mapped[str] = mapped_column(String)
     news_feed_ids: Mapped[list[int] | None] = mapped_column(
-        ARRAY(Integer),
+        ARRAY(Integer).with_variant(JSON, "sqlite"),
         nullable=True,
     )
     created_at: Mapped[DateTime] = mapped_column(TIMESTAMP, server_default=func.now())
     deleted_at: Mapped[DateTime | None] = mapped_column(TIMESTAMP, nullable=True)
 
 
+class SeenUrl(Base):
+    """Canonical urls that already went into a NewsFeed summary."""
+
+    __tablename__ = "seen_url"
+    url: Mapped[str] = mapped_column(String, primary_key=True)
+    news_feed_id: Mapped[int | None] = mapped_column(
+        ForeignKey("news_feed.id"), nullable=True
+    )
+    created_at: Mapped[DateTime] = mapped_column(TIMESTAMP, server_default=func.now())
+
+
+class ScrapeJob(Base):
+    """A queued or finished scrape_news run, picked up by dashbot.jobs."""
+
+    __tablename__ = "scrape_job"
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    status: Mapped[str] = mapped_column(String, default="queued")
+    queries: Mapped[list[str]] = mapped_column(JSON)
+    force: Mapped[bool] = mapped_column(Boolean, default=False)
+    stages: Mapped[dict] = mapped_column(JSON, default=dict)
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(TIMESTAMP, server_default=func.now())
+    started_at: Mapped[DateTime | None] = mapped_column(TIMESTAMP, nullable=True)
+    updated_at: Mapped[DateTime | None] = mapped_column(TIMESTAMP, nullable=True)
+    finished_at: Mapped[DateTime | None] = mapped_column(TIMESTAMP, nullable=True)
+
+
+class PipelineCheckpoint(Base):
+    """Output of one finished stage of a pipeline run, see dashbot.pipeline."""
+
+    __tablename__ = "pipeline_checkpoint"
+    run_id: Mapped[str] = mapped_column(String, primary_key=True)
+    stage: Mapped[str] = mapped_column(String, primary_key=True)
+    payload: Mapped[Any] = mapped_column(JSON)
+    created_at: Mapped[DateTime] = mapped_column(TIMESTAMP, server_default=func.now())
+
+
 # ---- CREATE TABLE ----
 if __name__ == "__main__":
-    # Drop all tables
-    Base.metadata.drop_all(engine)
-    Base.metadata.create_all(engine)
-    print("tables created")
+    # Tables are managed by migrations now, existing data is kept
+    from dashbot.scripts.migrations import main
+
+    main()
 
 
 """
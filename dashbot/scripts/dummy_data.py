@@ -1,7 +1,7 @@
 from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
-from dashbot.scripts.database import DATABASE_URL, NewsFeed
+from dashbot.scripts.database import NewsFeed, database_url
 
 
 dummy_news = [
@@ -39,7 +39,7 @@ dummy_news = [
 
 
 def main():
-    engine = create_engine(DATABASE_URL, echo=True)
+    engine = create_engine(database_url(), echo=True)
     with Session(engine) as session:
         for item in dummy_news:
             feed = NewsFeed(
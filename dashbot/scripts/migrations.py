@@ -0,0 +1,226 @@
+"""
+Schema migrations, replacing the drop-and-recreate of database.py.
+
+    python -m dashbot.scripts.migrations          # apply pending migrations
+    python -m dashbot.scripts.migrations --list   # show applied and pending
+
+Applied versions are recorded in the schema_migrations table. Each
+migration runs in its own transaction and only ever adds to the schema, so
+append new ones at the end of MIGRATIONS and never change applied ones.
+"""
+
+import argparse
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy import (
+    ARRAY,
+    JSON,
+    TIMESTAMP,
+    Boolean,
+    Column,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from dashbot.config import logger
+from dashbot.scripts.database import NewsFeed, get_engine
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", TIMESTAMP, server_default=func.now()),
+)
+
+
+# Tables as the migration that adds them creates them. Copies rather than
+# the models' tables, so an applied migration never changes when a model
+# does; change a table with a new migration instead.
+snapshots = MetaData()
+
+news_feed_v1 = Table(
+    "news_feed",
+    snapshots,
+    Column("id", Integer, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("content", String, nullable=False),
+    Column("source", String, nullable=False),
+    Column("image", String, nullable=False),
+    Column("score", Integer),
+    Column("feedback", String),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=func.now()),
+    Column("deleted_at", TIMESTAMP),
+)
+
+context_rules_v1 = Table(
+    "context_rules",
+    snapshots,
+    Column("id", Integer, primary_key=True),
+    Column("importance", Integer),
+    Column("rule", String, nullable=False),
+    Column("news_feed_ids", ARRAY(Integer).with_variant(JSON, "sqlite")),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=func.now()),
+    Column("deleted_at", TIMESTAMP),
+)
+
+seen_url_v5 = Table(
+    "seen_url",
+    snapshots,
+    Column("url", String, primary_key=True),
+    Column("news_feed_id", Integer, ForeignKey("news_feed.id")),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=func.now()),
+)
+
+scrape_job_v6 = Table(
+    "scrape_job",
+    snapshots,
+    Column("id", String, primary_key=True),
+    Column("status", String, nullable=False),
+    Column("queries", JSON, nullable=False),
+    Column("force", Boolean, nullable=False),
+    Column("stages", JSON, nullable=False),
+    Column("result", JSON),
+    Column("error", String),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=func.now()),
+    Column("started_at", TIMESTAMP),
+    Column("updated_at", TIMESTAMP),
+    Column("finished_at", TIMESTAMP),
+)
+
+pipeline_checkpoint_v7 = Table(
+    "pipeline_checkpoint",
+    snapshots,
+    Column("run_id", String, primary_key=True),
+    Column("stage", String, primary_key=True),
+    Column("payload", JSON, nullable=False),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=func.now()),
+)
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """ALTER TABLE ... ADD COLUMN unless the column exists (SQLite lacks IF NOT EXISTS)."""
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def create_indexes(conn: Connection, table: Table, *names: str) -> None:
+    """Create indexes declared on a model, by name, unless they exist."""
+    indexes = {index.name: index for index in table.indexes}
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+
+def create_tables(conn: Connection, *tables: Table) -> None:
+    """Create snapshot tables unless they exist."""
+    for table in tables:
+        table.create(conn, checkfirst=True)
+
+
+def initial(conn: Connection) -> None:
+    # Databases created by the old drop-and-recreate already have the
+    # tables, they are left alone
+    create_tables(conn, news_feed_v1, context_rules_v1)
+
+
+def feed_indexes(conn: Connection) -> None:
+    add_column(conn, "news_feed", "is_liked", "BOOLEAN NOT NULL DEFAULT false")
+    create_indexes(conn, NewsFeed.__table__, "ix_news_feed_live", "ix_news_feed_liked", "ix_news_feed_score")
+
+
+def feed_updated_at(conn: Connection) -> None:
+    # The same default as a fresh schema, except on SQLite tables with rows:
+    # SQLite cannot add a column with a non-constant default to those, and
+    # the ORM default fills updated_at in there
+    ddl = "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+    if conn.dialect.name == "sqlite" and conn.execute(text("SELECT 1 FROM news_feed LIMIT 1")).first():
+        ddl = "TIMESTAMP"
+    add_column(conn, "news_feed", "updated_at", ddl)
+    conn.execute(text("UPDATE news_feed SET updated_at = created_at WHERE updated_at IS NULL"))
+    create_indexes(conn, NewsFeed.__table__, "ix_news_feed_updated")
+
+
+def feed_run_id(conn: Connection) -> None:
+    add_column(conn, "news_feed", "run_id", "VARCHAR")
+    create_indexes(conn, NewsFeed.__table__, "ux_news_feed_run_title")
+
+
+def seen_url(conn: Connection) -> None:
+    create_tables(conn, seen_url_v5)
+
+
+def scrape_job(conn: Connection) -> None:
+    create_tables(conn, scrape_job_v6)
+
+
+def pipeline_checkpoint(conn: Connection) -> None:
+    create_tables(conn, pipeline_checkpoint_v7)
+
+
+MIGRATIONS = [
+    Migration(1, "initial", initial),
+    Migration(2, "feed_indexes", feed_indexes),
+    Migration(3, "feed_updated_at", feed_updated_at),
+    Migration(4, "feed_run_id", feed_run_id),
+    Migration(5, "seen_url", seen_url),
+    Migration(6, "scrape_job", scrape_job),
+    Migration(7, "pipeline_checkpoint", pipeline_checkpoint),
+]
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        return set(conn.scalars(select(schema_migrations.c.version)))
+
+
+def migrate(engine: Engine, migrations: list[Migration] = MIGRATIONS) -> list[int]:
+    """Apply pending migrations in order; returns the versions applied."""
+    done = applied_versions(engine)
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        with engine.begin() as conn:
+            migration.apply(conn)
+            conn.execute(
+                schema_migrations.insert().values(version=migration.version, name=migration.name)
+            )
+        logger.info(f"Applied migration {migration.version} {migration.name}")
+        applied.append(migration.version)
+    return applied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--list", action="store_true", help="show migrations instead of applying them")
+    args = parser.parse_args()
+    engine = get_engine()
+    if args.list:
+        done = applied_versions(engine)
+        for m in MIGRATIONS:
+            print(f"{m.version:>4} {m.name:<24} {'applied' if m.version in done else 'pending'}")
+        return
+    applied = migrate(engine)
+    print(f"applied {len(applied)} migrations" if applied else "database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import Insert, Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+
+from dashbot import feed
+from dashbot.api.urls import canonical_url
+from dashbot.config import logger
+from dashbot.scripts.database import ContextRules, NewsFeed, SeenUrl, SessionLocal
+
+
+@dataclass(frozen=True)
+class NewsItem:
+    title: str
+    content: str
+    source: str
+    image: str
+    urls: list[str] = field(default_factory=list)
+    score: int = 0
+
+
+def _insert(session: Session, table: Table) -> Insert:
+    """INSERT with ON CONFLICT support for the dialect in use."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"no upsert for {dialect}")
+
+
+def store_news(
+    items: Sequence[NewsItem],
+    run_id: str,
+    rules: Sequence[ContextRules] = (),
+    session_factory: sessionmaker | None = None,
+) -> dict[str, int]:
+    """
+    Write all NewsFeed items of a run, the urls they were written from and
+    any ContextRules in one transaction on the application's engine.
+    Items are upserted on (run_id, title), so storing a run again updates
+    its items instead of duplicating them. Returns the id per title.
+    """
+    by_title = {item.title: item for item in items}
+    if not by_title and not rules:
+        return {}
+    session_factory = session_factory or SessionLocal
+    with session_factory() as session:
+        ids: dict[str, int] = {}
+        if by_title:
+            insert = _insert(session, NewsFeed.__table__)
+            statement = insert.on_conflict_do_update(
+                index_elements=[NewsFeed.run_id, NewsFeed.title],
+                set_={
+                    "content": insert.excluded.content,
+                    "source": insert.excluded.source,
+                    "image": insert.excluded.image,
+                    "updated_at": insert.excluded.updated_at,
+                },
+            ).returning(NewsFeed.id, NewsFeed.title)
+            now = datetime.now()
+            rows = session.execute(
+                statement,
+                [
+                    {
+                        "run_id": run_id,
+                        "title": item.title,
+                        "content": item.content,
+                        "source": item.source,
+                        "image": item.image,
+                        "score": item.score,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for item in by_title.values()
+                ],
+            )
+            ids = {title: id for id, title in rows}
+
+            # Urls seen before (e.g. on a forced refresh) point at the newer item
+            marks = {
+                canonical_url(url): ids[item.title]
+                for item in by_title.values()
+                for url in item.urls
+                if url
+            }
+            if marks:
+                insert = _insert(session, SeenUrl.__table__)
+                session.execute(
+                    insert.on_conflict_do_update(
+                        index_elements=[SeenUrl.url],
+                        set_={"news_feed_id": insert.excluded.news_feed_id},
+                    ),
+                    [{"url": url, "news_feed_id": id} for url, id in marks.items()],
+                )
+        session.add_all(rules)
+        session.commit()
+    feed.bump_version()
+    logger.info(f"Stored {len(ids)} news items and {len(rules)} rules for run {run_id}")
+    return ids
@@ -0,0 +1,52 @@
+"""Shared pytest setup for dashbot tests."""
+
+import os
+import tempfile
+
+import pytest
+
+# Keep the on-disk caches out of the working tree
+os.environ.setdefault(
+    "DASHBOT_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="dashbot-test-"), "cache.sqlite3")
+)
+
+# Pace test requests only nominally; tests of the scheduler pass their own rates
+os.environ.setdefault("FETCH_RATE", "1000")
+os.environ.setdefault("FETCH_BURST", "100")
+# Parse in a thread unless a test asks for the process pool
+os.environ.setdefault("PARSE_WORKERS", "0")
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """
+    A migrated SQLite database for one test. A file rather than one shared
+    in-memory connection, so the job worker and stages that use the
+    database from threads get their own connections.
+    """
+    from sqlalchemy import create_engine
+
+    from dashbot.scripts.migrations import migrate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'dashbot.sqlite3'}")
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_sessions(db_engine):
+    """Session factory on db_engine."""
+    from sqlalchemy.orm import sessionmaker
+
+    return sessionmaker(bind=db_engine)
+
+
+@pytest.fixture(autouse=True)
+def _reset_fetch_scheduler():
+    """Every test starts without host state or cached robots.txt files."""
+    from dashbot.api.scheduler import scheduler
+
+    scheduler.reset()
+    yield
+    scheduler.reset()
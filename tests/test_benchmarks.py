@@ -0,0 +1,64 @@
+"""Offline tests for the benchmark stand-ins: the clients dashbot uses accept their answers."""
+
+import io
+import json
+
+import httpx
+import pytest
+from PIL import Image
+
+from benchmarks import fakes
+from benchmarks.corpus import load_corpus
+from dashbot.api import cse, http_client, llm
+
+
+@pytest.fixture
+def services():
+    settings = fakes.Settings(
+        corpus=load_corpus(None, 3), publisher_latency=0, cse_latency=0, llm_latency=0, s3_latency=0
+    )
+    services = fakes.start(settings)
+    yield services
+    services.close()
+
+
+@pytest.mark.asyncio
+async def test_search_results_link_to_publisher_pages(services, monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "benchmark")
+    monkeypatch.setenv("GOOGLE_CSE_ID", "benchmark")
+    monkeypatch.setattr(cse, "GOOGLE_CSE_URL", f"{services.url('cse')}/customsearch/v1")
+    async with http_client.session():
+        pages = await cse.search_google("tennis", use_cache=False)
+        again = await cse.search_google("tennis", use_cache=False)
+        article = await cse.fetch_article(pages[0])
+
+    assert len(pages) == fakes.PAGES_PER_QUERY
+    assert [p.url for p in pages] == [p.url for p in again]
+    assert pages[0].url.startswith(services.url("publisher"))
+    assert len(article.content) > 500
+    assert services.settings.requests == {"cse": 2, "publisher": 2}  # robots.txt and the page
+
+
+@pytest.mark.asyncio
+async def test_openai_stub_answers_topic_and_summary_prompts(services):
+    backend = llm.OpenAIBackend(api_key="benchmark", base_url=f"{services.url('openai')}/v1")
+    try:
+        pages = json.dumps([{"title": "t", "snippet": "s", "id": i} for i in range(7)])
+        topics = await backend.complete(
+            "gpt-4o-mini",
+            [{"role": "system", "content": "You cluster pages into topics"}, {"role": "user", "content": f"pages: {pages}"}],
+        )
+        summary = await backend.complete("gpt-4o-mini", [{"role": "user", "content": "summarise"}])
+    finally:
+        await backend.close()
+
+    assert [t["ids"] for t in json.loads(topics)] == [[0, 1, 2, 3, 4], [5, 6]]
+    assert len(summary.split()) == services.settings.summary_words
+
+
+def test_s3_stub_serves_a_distinct_png_per_key(services):
+    a = httpx.get(f"{services.url('s3')}/bucket/news-images/a.png")
+    b = httpx.get(f"{services.url('s3')}/bucket/news-images/b.png")
+
+    assert Image.open(io.BytesIO(a.content)).size == services.settings.image_size
+    assert a.headers["etag"] != b.headers["etag"]
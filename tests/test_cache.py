@@ -0,0 +1,88 @@
+"""Offline tests for the SQLite cache and the cached CSE search."""
+
+import time
+
+import httpx
+import pytest
+
+from dashbot.api import cse, http_client
+from dashbot.api.cache import Cache, make_key
+
+
+def test_cache_ttl(tmp_path):
+    """Entries are returned until they are older than the ttl."""
+    cache = Cache("test", ttl=0.05, path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", {"value": 1})
+    assert cache.get("a") == {"value": 1}
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_cache_lru_eviction(tmp_path):
+    """The least recently used entries are dropped beyond max_entries."""
+    cache = Cache("test", ttl=None, max_entries=2, path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    assert cache.get("a") == 1  # a is now more recent than b
+    time.sleep(0.01)
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_cache_byte_budget(tmp_path):
+    """Entries are evicted until the namespace fits into max_bytes."""
+    cache = Cache("test", ttl=None, max_bytes=250, path=str(tmp_path / "cache.sqlite3"))
+    for i in range(5):
+        cache.set(str(i), "x" * 100)
+        time.sleep(0.01)
+    assert len(cache) == 2
+    assert cache.get("4") is not None
+
+
+def test_cache_budget_counts_entries_already_in_the_file(tmp_path):
+    """A reopened cache knows what the file holds and evicts only the excess."""
+    path = str(tmp_path / "cache.sqlite3")
+    first = Cache("test", ttl=None, path=path)
+    for i in range(4):
+        first.set(str(i), i)
+        time.sleep(0.01)
+
+    cache = Cache("test", ttl=None, max_entries=3, path=path)
+    cache.set("4", 4)
+    assert len(cache) == 3
+    assert [cache.get(str(i)) for i in range(5)] == [None, None, 2, 3, 4]
+
+
+def test_make_key_is_order_independent():
+    assert make_key("url", {"a": 1, "b": 2}) == make_key("url", {"b": 2, "a": 1})
+    assert make_key("url", {"a": 1}) != make_key("url", {"a": 2})
+
+
+@pytest.mark.asyncio
+async def test_search_google_uses_cache(monkeypatch, tmp_path):
+    """A repeated query is answered from the cache without a request."""
+    monkeypatch.setenv("GOOGLE_API_KEY", "key")
+    monkeypatch.setenv("GOOGLE_CSE_ID", "cx")
+    monkeypatch.setattr(cse, "_search_cache", Cache("cse", ttl=60, path=str(tmp_path / "c.sqlite3")))
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        item = {"link": "https://a.example/1", "title": "t", "snippet": "s", "displayLink": "a.example"}
+        return httpx.Response(200, json={"items": [item]})
+
+    await http_client.start(transport=httpx.MockTransport(handler))
+    try:
+        first = await cse.search_google("climate change")
+        second = await cse.search_google("climate change")
+    finally:
+        await http_client.close()
+
+    assert len(calls) == 1
+    assert first == second
+    assert cse.search_cache().stats.hits == 1
@@ -0,0 +1,69 @@
+"""Offline tests for local topic clustering."""
+
+from typing import Any
+
+import pytest
+
+from dashbot.api import ai, llm
+from dashbot.api.cluster import cluster, vectorise
+from dashbot.api.cse import GoogleCSE
+
+PAGES = [
+    GoogleCSE("https://a.example/1", "Bavarian election: CSU wins state vote", "The CSU won the Bavarian state election on Sunday", "a", "q"),
+    GoogleCSE("https://b.example/2", "Tennis: Alcaraz wins the US Open final", "Carlos Alcaraz beat Sinner in the US Open final", "b", "q"),
+    GoogleCSE("https://c.example/3", "CSU wins Bavarian state election again", "Markus Soeder's CSU wins the Bavarian election", "c", "q"),
+    GoogleCSE("https://d.example/4", "Alcaraz beats Sinner to win US Open", "US Open final: Alcaraz wins against Sinner", "d", "q"),
+    GoogleCSE("https://e.example/5", "New Python release speeds up the interpreter", "Python 3.14 ships a faster interpreter", "e", "q"),
+]
+
+
+class NamingBackend:
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.prompts: list[str] = []
+
+    async def complete(self, model: str, messages: llm.Messages, **params: Any) -> str:
+        self.prompts.append(messages[-1]["content"])
+        return self.reply
+
+    async def close(self) -> None:
+        pass
+
+
+def test_vectorise_normalises_rows():
+    vectors = vectorise(["alpha beta gamma", "", "alpha beta"])
+    assert vectors.shape[0] == 3
+    assert abs(float((vectors[0] ** 2).sum()) - 1) < 1e-5
+    assert float(abs(vectors[1]).sum()) == 0
+
+
+def test_cluster_groups_same_story():
+    groups = cluster(vectorise([f"{p.title} {p.snippet}" for p in PAGES]))
+    assert sorted(map(sorted, groups)) == [[0, 2], [1, 3], [4]]
+
+
+@pytest.mark.asyncio
+async def test_generate_topics_local_names_clusters():
+    """The model only names clusters; page ids come from the local pass."""
+    backend = NamingBackend('[{"id": 0, "topic": "bavarian election", "importance": 7}]')
+    llm.set_backend(backend)
+    try:
+        topics = await ai.generate_topics_local(PAGES)
+    finally:
+        llm.set_backend(None)
+
+    assert topics[0] == ai.Topic("bavarian election", 7, [0, 2])
+    assert {tuple(t.pages) for t in topics} == {(0, 2), (1, 3), (4,)}
+    assert "snippet" not in backend.prompts[0]
+
+
+@pytest.mark.asyncio
+async def test_generate_topics_local_survives_malformed_reply():
+    llm.set_backend(NamingBackend("not json"))
+    try:
+        topics = await ai.generate_topics_local(PAGES)
+    finally:
+        llm.set_backend(None)
+
+    assert len(topics) == 3
+    assert topics[0].topic == PAGES[0].title
@@ -0,0 +1,42 @@
+"""Offline tests for the token-budgeted summary context builder."""
+
+from dashbot.api.context import build_context, count_tokens, split_passages
+
+
+def test_count_tokens_grows_with_text():
+    assert count_tokens("") == 0
+    assert 0 < count_tokens("Climate change is real.") < count_tokens("Climate change is real. " * 10)
+
+
+def test_split_passages_breaks_long_paragraphs():
+    text = "Short intro.\n\n" + " ".join(f"Sentence number {i} is here." for i in range(100))
+    passages = split_passages(text, max_tokens=40)
+    assert passages[0] == "Short intro."
+    assert len(passages) > 3
+    assert all(count_tokens(p) <= 40 for p in passages[1:-1])
+
+
+def test_build_context_stays_within_budget():
+    """Huge articles are cut down to the budget but every title is kept."""
+    filler = "\n".join(f"Unrelated paragraph {i} about cooking pasta and sauces." for i in range(500))
+    articles = [("Election in Bavaria", filler), ("Bavaria votes", filler)]
+
+    context = build_context("bavarian election", articles, budget=300)
+
+    assert count_tokens(context) <= 300 + 10
+    assert "Election in Bavaria" in context and "Bavaria votes" in context
+
+
+def test_build_context_prefers_relevant_passages():
+    """Passages about the topic win over filler, and keep their order."""
+    filler = "\n".join(f"Weather paragraph {i} mentions sunshine and light wind." for i in range(40))
+    content = (
+        filler
+        + "\nThe election in Bavaria ended with the CSU as the strongest party."
+        + "\nTurnout in the Bavarian election rose to a record high."
+    )
+
+    context = build_context("bavarian election", [("Results", content)], budget=80)
+
+    assert "CSU as the strongest party" in context
+    assert context.index("CSU") < context.index("Turnout")
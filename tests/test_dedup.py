@@ -0,0 +1,72 @@
+"""Offline tests for url canonicalisation and near-duplicate page removal."""
+
+from dashbot.api.ai import Topic, get_pages_per_topic
+from dashbot.api.cse import GoogleCSE
+from dashbot.api.dedup import dedupe_pages
+from dashbot.api.urls import canonical_url
+
+
+def make_page(url: str, title: str, snippet: str) -> GoogleCSE:
+    return GoogleCSE(url=url, title=title, snippet=snippet, source="source", query="q")
+
+
+def test_canonical_url_amp_variants():
+    """AMP copies map to the page they mirror."""
+    expected = "https://bbc.com/news/world-123"
+    assert canonical_url("https://www-bbc-com.cdn.ampproject.org/c/s/www.bbc.com/news/world-123") == expected
+    assert canonical_url("https://amp.bbc.com/news/world-123") == expected
+    assert canonical_url("https://www.bbc.com/news/amp/world-123?amp=1") == expected
+    assert canonical_url("https://bbc.com/news/world-123.amp") == expected
+
+
+def test_dedupe_pages_same_url_and_near_duplicate_text():
+    """Tracking-param links and syndicated copies are dropped, order is kept."""
+    pages = [
+        make_page(
+            "https://www.bbc.com/news/climate-1",
+            "Climate change: New study shows rising temperatures",
+            "Scientists report that global temperatures have increased significantly over the last decade",
+        ),
+        make_page(
+            "https://bbc.com/news/climate-1?utm_source=twitter",
+            "Something else entirely",
+            "Different snippet text",
+        ),
+        make_page(
+            "https://mirror.example/climate-study",
+            "Climate change: new study shows rising temperatures -",
+            "Scientists report that global temperatures have increased significantly over the last decade ...",
+        ),
+        make_page(
+            "https://www.reuters.com/business/energy/123456",
+            "Renewable energy investments reach record high",
+            "Global investments in renewable energy sources have reached unprecedented levels",
+        ),
+    ]
+
+    unique = dedupe_pages(pages)
+
+    assert unique == [pages[0], pages[3]]
+
+
+def test_dedupe_pages_keeps_topic_ids_valid():
+    """Topic ids produced for the deduplicated list resolve to the right pages."""
+    pages = [
+        make_page("https://a.example/1", "Election results are in for the state of Bavaria", "Votes counted overnight show a close race"),
+        make_page("https://a.example/1#top", "Election results", "copy"),
+        make_page("https://b.example/2", "Tennis star wins the final in five long sets", "A thrilling match at the open ended late at night"),
+    ]
+
+    unique = dedupe_pages(pages)
+    topic = Topic("Tennis", 5, [1])
+
+    assert get_pages_per_topic(unique, topic) == [pages[2]]
+
+
+def test_dedupe_pages_keeps_short_texts():
+    """Short titles without snippets are not fingerprinted and so never merged."""
+    pages = [
+        make_page("https://a.example/1", "News", ""),
+        make_page("https://b.example/2", "News", ""),
+    ]
+    assert dedupe_pages(pages) == pages
@@ -0,0 +1,201 @@
+"""Offline tests for the concurrent article extraction stage."""
+
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+from dashbot.api import cse, http_client
+from dashbot.api.cache import Cache
+from dashbot.api.cse import GoogleCSE, WebArticle
+from dashbot.api.urls import canonical_url
+
+
+def make_page(url: str) -> GoogleCSE:
+    return GoogleCSE(url=url, title="title", snippet="snippet", source="source", query="q")
+
+
+def fake_fetch(delay: float, active: dict[str, int], peak: dict[str, int]):
+    """Stand-in for fetch_article that records per-host concurrency."""
+
+    async def fetch(page: GoogleCSE, timeout: float) -> WebArticle:
+        host = page.url.split("/")[2]
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        await asyncio.sleep(delay)
+        active[host] -= 1
+        return WebArticle([], f"content of {page.url}", page.source, None, page)
+
+    return fetch
+
+
+@pytest.mark.asyncio
+async def test_extract_articles_runs_concurrently(monkeypatch):
+    """Pages on different hosts are fetched in parallel and keep their order."""
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+    monkeypatch.setattr(cse, "fetch_article", fake_fetch(0.2, active, peak))
+    pages = [make_page(f"https://site{i}.example/a") for i in range(8)]
+
+    start = time.perf_counter()
+    articles = await cse.extract_articles(pages, concurrency=8, per_domain=2)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.2 * 3
+    assert [a.google_cse for a in articles if a] == pages
+
+
+@pytest.mark.asyncio
+async def test_extract_articles_per_domain_limit(monkeypatch):
+    """No more than `per_domain` pages of one host are fetched at once."""
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+    monkeypatch.setattr(cse, "fetch_article", fake_fetch(0.05, active, peak))
+    pages = [make_page(f"https://one.example/{i}") for i in range(6)]
+
+    articles = await cse.extract_articles(pages, concurrency=6, per_domain=2)
+
+    assert all(a is not None for a in articles)
+    assert peak["one.example"] == 2
+
+
+@pytest.mark.asyncio
+async def test_extract_articles_timeout_and_errors(monkeypatch):
+    """Slow or failing pages come back as None without failing the batch."""
+
+    async def fetch(page: GoogleCSE, timeout: float) -> WebArticle:
+        if "slow" in page.url:
+            await asyncio.wait_for(asyncio.sleep(0.5), timeout)
+        if "broken" in page.url:
+            raise ValueError("boom")
+        return WebArticle([], "ok", page.source, None, page)
+
+    monkeypatch.setattr(cse, "fetch_article", fetch)
+    pages = [make_page(f"https://{h}.example/") for h in ("slow", "broken", "fine")]
+
+    articles = await cse.extract_articles(pages, timeout=0.1)
+
+    assert articles[0] is None
+    assert articles[1] is None
+    assert articles[2] is not None and articles[2].content == "ok"
+
+
+@pytest.mark.asyncio
+async def test_extract_timeout_starts_when_the_host_slot_is_free(monkeypatch, tmp_path):
+    """Pages queued behind a Crawl-delay longer than the timeout still succeed."""
+    monkeypatch.setattr(cse, "_article_cache", Cache("articles", ttl=None, path=str(tmp_path / "a.sqlite3")))
+    monkeypatch.setattr(
+        cse, "parse_html", lambda url, html, encoding=None: {"authors": [], "content": "ok", "source": "", "publish_date": None}
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text="User-agent: *\nCrawl-delay: 1\n")
+        return httpx.Response(200, text="body")
+
+    await http_client.start(transport=httpx.MockTransport(handler))
+    try:
+        pages = [make_page(f"https://slow-host.example/{i}") for i in range(2)]
+        articles = await cse.extract_articles(pages, timeout=0.5)
+    finally:
+        await http_client.close()
+
+    assert [a.content if a else None for a in articles] == ["ok", "ok"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_article_revalidates_with_etag(monkeypatch, tmp_path):
+    """A stale stored article is revalidated and reused on 304 without parsing."""
+    monkeypatch.setattr(cse, "_article_cache", Cache("articles", ttl=None, path=str(tmp_path / "a.sqlite3")))
+    monkeypatch.setattr(cse, "ARTICLE_MAX_AGE", 0)
+    parsed = []
+    seen_headers = []
+
+    def parse(url: str, html: bytes, encoding: str | None = None) -> dict:
+        parsed.append(url)
+        return {"authors": ["Jane"], "content": html.decode(), "source": "https://news.example", "publish_date": None}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        seen_headers.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"etag": '"v1"'}, text="body")
+
+    monkeypatch.setattr(cse, "parse_html", parse)
+    await http_client.start(transport=httpx.MockTransport(handler))
+    try:
+        first = await cse.fetch_article(make_page("https://news.example/story?utm_source=x"))
+        second = await cse.fetch_article(make_page("https://www.news.example/story"))
+    finally:
+        await http_client.close()
+
+    assert seen_headers == [None, '"v1"']
+    assert len(parsed) == 1
+    assert first.content == second.content == "body"
+    assert second.google_cse.url == "https://www.news.example/story"
+
+
+@pytest.mark.asyncio
+async def test_fetch_article_skips_request_while_fresh(monkeypatch, tmp_path):
+    """A stored article younger than ARTICLE_MAX_AGE needs no request at all."""
+    monkeypatch.setattr(cse, "_article_cache", Cache("articles", ttl=None, path=str(tmp_path / "a.sqlite3")))
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        calls.append(request.url)
+        return httpx.Response(200, text="body")
+
+    monkeypatch.setattr(
+        cse, "parse_html", lambda url, html, encoding=None: {"authors": [], "content": "", "source": "", "publish_date": None}
+    )
+    await http_client.start(transport=httpx.MockTransport(handler))
+    try:
+        await cse.fetch_article(make_page("https://news.example/a"))
+        await cse.fetch_article(make_page("https://news.example/a#comments"))
+    finally:
+        await http_client.close()
+
+    assert len(calls) == 1
+
+
+def test_canonical_url():
+    """Tracking parameters, www, fragments and trailing slashes are dropped."""
+    assert canonical_url("HTTPS://www.Example.com:443/a/?b=2&utm_source=x&a=1#top") == "https://example.com/a?a=1&b=2"
+    assert canonical_url("http://example.com") == "http://example.com/"
+    assert canonical_url("https://example.com:8443/a") == "https://example.com:8443/a"
+
+
+def test_parser_processes_only_where_asked_for(monkeypatch):
+    """The web process parses in a thread; the worker and CLI opt into processes."""
+    monkeypatch.setattr(cse, "PARSE_WORKERS", 0)
+    monkeypatch.delenv("PARSE_WORKERS", raising=False)
+    assert cse.parse_pool() is None
+    cse.use_parse_processes()
+    assert cse.PARSE_WORKERS == (os.cpu_count() or 1)
+
+    monkeypatch.setattr(cse, "PARSE_WORKERS", 0)
+    monkeypatch.setenv("PARSE_WORKERS", "0")
+    cse.use_parse_processes()
+    assert cse.PARSE_WORKERS == 0
+
+
+@pytest.mark.asyncio
+async def test_parse_page_in_process_pool(monkeypatch):
+    """Raw bytes go to a parser process and a WebArticle comes back."""
+    monkeypatch.setattr(cse, "PARSE_WORKERS", 1)
+    paragraph = "The council approved the new tram line through the old town on Monday. " * 5
+    html = f"<html><head><title>Tram</title></head><body><article><p>{paragraph}</p><p>{paragraph}</p></article></body></html>"
+    page = make_page("https://news.example/tram")
+    try:
+        article = await cse.parse_page(page, html.encode("utf-8"), "utf-8")
+    finally:
+        cse.close_parse_pool()
+
+    assert "tram line" in article.content
+    assert article.google_cse is page
@@ -0,0 +1,184 @@
+"""Offline tests for keyset pagination of the feed, run against a SQLite db."""
+
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from dashbot import feed
+from dashbot.scripts.database import NewsFeed
+
+
+def add_items(session: Session, count: int) -> None:
+    start = datetime(2025, 9, 1)
+    for i in range(count):
+        # Pairs share a timestamp so the id has to break ties
+        session.add(
+            NewsFeed(title=f"t{i}", content="c", source="s", image="i", created_at=start + timedelta(hours=i // 2))
+        )
+    session.commit()
+
+
+def test_pages_cover_the_feed_once_newest_first(db_sessions):
+    with db_sessions() as session:
+        add_items(session, 7)
+        session.add(NewsFeed(title="gone", content="c", source="s", image="i", deleted_at=datetime(2025, 9, 2)))
+        session.commit()
+
+        titles, cursor, pages = [], None, 0
+        while True:
+            page = feed.feed_page(session, cursor, limit=3)
+            titles += [item.title for item in page.items]
+            pages += 1
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+    assert titles == [f"t{i}" for i in reversed(range(7))]
+    assert pages == 3
+
+
+def test_new_items_do_not_shift_later_pages(db_sessions):
+    with db_sessions() as session:
+        add_items(session, 4)
+        first = feed.feed_page(session, limit=2)
+        session.add(NewsFeed(title="new", content="c", source="s", image="i", created_at=datetime(2025, 10, 1)))
+        session.commit()
+        second = feed.feed_page(session, first.next_cursor, limit=2)
+
+    assert [i.title for i in second.items] == ["t1", "t0"]
+    assert second.next_cursor is None
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        feed.decode_cursor("not-a-cursor")
+
+
+def test_toggle_like_flips_in_the_database(db_sessions):
+    with db_sessions() as session:
+        add_items(session, 1)
+        version = feed.fragment_cache.version
+        states = [feed.toggle_like(session, 1) for _ in range(3)]
+        missing = feed.toggle_like(session, 99)
+        item = session.get(NewsFeed, 1)
+
+    assert states == [True, False, True]
+    assert item.is_liked is True
+    assert missing is None
+    assert feed.fragment_cache.version == version + 3
+
+
+def fragment(html: str) -> feed.Fragment:
+    return feed.Fragment(html, '"etag"')
+
+
+def test_fragment_cache_lru_and_versions(monkeypatch):
+    cache = feed.FragmentCache(max_entries=2, ttl=60)
+    cache.set("a", fragment("<a>"), cache.version)
+    cache.set("b", fragment("<b>"), cache.version)
+    assert cache.get("a") == fragment("<a>")
+    cache.set("c", fragment("<c>"), cache.version)  # evicts b, a was used more recently
+    assert cache.get("b") is None
+    assert cache.get("a") == fragment("<a>")
+
+    version = cache.version
+    cache.bump()
+    assert cache.get("a") is None
+    # A render that read the feed before the bump is not stored
+    cache.set("a", fragment("<old>"), version)
+    assert cache.get("a") is None
+    assert (cache.stats.hits, cache.stats.misses) == (2, 3)
+
+    cache.set("a", fragment("<a2>"), cache.version)
+    monkeypatch.setattr(feed.time, "monotonic", lambda: float("inf"))
+    assert cache.get("a") is None
+
+
+async def make_async_session(db_engine: Engine) -> AsyncSession:
+    """An async session on the database file of `db_engine`."""
+    engine = create_async_engine(db_engine.url.set(drivername="sqlite+aiosqlite"))
+    session = AsyncSession(engine, expire_on_commit=False)
+    await session.run_sync(add_items, 3)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_hx_news_feed_served_from_memory(monkeypatch, db_engine):
+    """Repeated feed requests come from memory, revalidation from the ETag."""
+    from dashbot import main
+
+    queries = []
+    real_feed_page = feed.feed_page
+
+    def counting_feed_page(*args, **kwargs):
+        queries.append(args[1:])
+        return real_feed_page(*args, **kwargs)
+
+    session = await make_async_session(db_engine)
+
+    async def get_db():
+        yield session
+
+    monkeypatch.setattr(feed, "fragment_cache", feed.FragmentCache())
+    monkeypatch.setattr(feed, "feed_page", counting_feed_page)
+    main.app.dependency_overrides[main.get_db] = get_db
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/hx/news-feed")
+            second = await client.get("/hx/news-feed")
+            feed.bump_version()
+            third = await client.get("/hx/news-feed")
+            revalidated = await client.get("/hx/news-feed", headers={"If-None-Match": first.headers["etag"]})
+            liked = await client.post("/toggle-like/1")
+            changed = await client.get("/hx/news-feed", headers={"If-None-Match": first.headers["etag"]})
+    finally:
+        main.app.dependency_overrides.clear()
+        await session.close()
+        await session.bind.dispose()
+
+    assert first.status_code == 200
+    assert "t2" in first.text
+    assert first.text == second.text == third.text
+    assert first.headers["etag"] == third.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert liked.status_code == 200
+    assert 'aria-pressed="true"' in liked.text
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert len(queries) == 3
+
+
+@pytest.mark.asyncio
+async def test_hx_news_feed_caps_the_limit_before_caching(monkeypatch, db_engine):
+    """Limits above the maximum share one cache entry; zero is rejected."""
+    from dashbot import main
+
+    session = await make_async_session(db_engine)
+
+    async def get_db():
+        yield session
+
+    monkeypatch.setattr(feed, "fragment_cache", feed.FragmentCache())
+    monkeypatch.setattr(feed, "FEED_MAX_PAGE_SIZE", 2)
+    main.app.dependency_overrides[main.get_db] = get_db
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            pages = [await client.get(f"/hx/news-feed?limit={limit}") for limit in (2, 3, 10000)]
+            zero = await client.get("/hx/news-feed?limit=0")
+    finally:
+        main.app.dependency_overrides.clear()
+        await session.close()
+        await session.bind.dispose()
+
+    assert [p.status_code for p in pages] == [200, 200, 200]
+    assert (feed.fragment_cache.stats.hits, feed.fragment_cache.stats.misses) == (2, 1)
+    assert "limit=2" in pages[2].text
+    assert zero.status_code == 422
@@ -0,0 +1,67 @@
+"""Offline tests for the shared HTTP client."""
+
+import httpx
+import pytest
+
+from dashbot.api import http_client
+
+
+@pytest.mark.asyncio
+async def test_request_retries_on_5xx_and_429():
+    """429/5xx responses are retried until a good response arrives."""
+    statuses = iter([503, 429, 200])
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        status = next(statuses)
+        headers = {"retry-after": "0"} if status == 429 else {}
+        return httpx.Response(status, headers=headers, json={"ok": status == 200})
+
+    await http_client.start(transport=httpx.MockTransport(handler))
+    try:
+        resp = await http_client.request("GET", "https://example.com/", backoff=0.01)
+    finally:
+        await http_client.close()
+
+    assert resp.status_code == 200
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_request_gives_up_after_retries():
+    """The last error response is returned once retries are exhausted."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        return httpx.Response(500)
+
+    await http_client.start(transport=httpx.MockTransport(handler))
+    try:
+        resp = await http_client.request("GET", "https://example.com/", retries=2, backoff=0.01)
+    finally:
+        await http_client.close()
+
+    assert resp.status_code == 500
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_shared_client_lifecycle():
+    """start() is idempotent and close() releases the client."""
+    client = await http_client.start()
+    assert await http_client.start() is client
+    assert http_client.get_client() is client
+    await http_client.close()
+    with pytest.raises(RuntimeError):
+        http_client.get_client()
+
+
+def test_retry_after_parsing():
+    """Retry-After is understood both as seconds and as an HTTP date."""
+    assert http_client._retry_after(httpx.Response(429, headers={"retry-after": "3"})) == 3.0
+    assert http_client._retry_after(
+        httpx.Response(429, headers={"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    ) == 0.0
+    assert http_client._retry_after(httpx.Response(429)) is None
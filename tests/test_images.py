@@ -0,0 +1,173 @@
+"""Offline tests for the /image endpoint and the local image cache, with a fake S3 client."""
+
+import asyncio
+import io
+import time
+
+import pytest
+from botocore.response import StreamingBody
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from dashbot import main
+from dashbot.api import s3, thumbnails
+
+
+class FakeS3:
+    def __init__(self, objects: dict[str, bytes], delay: float = 0):
+        self.objects = objects
+        self.delay = delay
+        self.calls = []
+
+    def get_object(self, Bucket: str, Key: str):
+        self.calls.append(Key)
+        time.sleep(self.delay)
+        data = self.objects[Key]
+        return {"Body": StreamingBody(io.BytesIO(data), len(data)), "ETag": f'"etag-{len(data)}"'}
+
+
+@pytest.fixture
+def fake_s3(monkeypatch, tmp_path):
+    fake = FakeS3({"news-images/a.png": b"png bytes" * 10_000, "news-images/b.jpg": b"jpg"})
+    monkeypatch.setattr(s3, "_client", fake)
+    monkeypatch.setattr(s3, "_image_cache", s3.ImageCache(str(tmp_path / "images")))
+    return fake
+
+
+def test_image_served_from_cache_with_etag(fake_s3):
+    client = TestClient(main.app)
+
+    first = client.get("/image/a.png")
+    second = client.get("/image/a.png")
+    again = client.get("/image/a.png", headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content == b"png bytes" * 10_000
+    assert first.headers["content-type"] == "image/png"
+    assert first.headers["cache-control"] == main.IMAGE_CACHE_CONTROL
+    assert again.status_code == 304
+    assert again.headers["etag"] == first.headers["etag"] == '"etag-90000"'
+    assert fake_s3.calls == ["news-images/a.png"]
+
+
+def test_missing_image_gets_placeholder(fake_s3):
+    resp = TestClient(main.app).get("/image/missing.png")
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == "no-store"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_download(fake_s3):
+    fake_s3.delay = 0.05
+    images = await asyncio.gather(*(s3.get_image("b.jpg") for _ in range(5)))
+    assert len({i.path for i in images}) == 1
+    assert fake_s3.calls == ["news-images/b.jpg"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_the_shared_download(fake_s3):
+    """The request that started a download can go away; the others still get the image."""
+    fake_s3.delay = 0.1
+    first = asyncio.create_task(s3.get_image("b.jpg"))
+    await asyncio.sleep(0.02)
+    second = asyncio.create_task(s3.get_image("b.jpg"))
+    await asyncio.sleep(0.02)
+    first.cancel()
+
+    image = await second
+    assert b"".join(s3.stream(image)) == b"jpg"
+    assert first.cancelled()
+    assert fake_s3.calls == ["news-images/b.jpg"]
+
+
+def test_cache_evicts_least_recently_used_and_reloads(tmp_path):
+    cache = s3.ImageCache(str(tmp_path), max_bytes=10)
+    cache.put("a", iter([b"aaaa"]), None, "image/png")
+    cache.put("b", iter([b"bbbb"]), None, "image/png")
+    assert cache.get("a") is not None
+    cache.put("c", iter([b"cccc"]), None, "image/png")  # over budget, b goes
+
+    assert cache.get("b") is None
+    image = cache.get("c")
+    assert b"".join(s3.stream(image)) == b"cccc"
+    assert image.etag.startswith('"')
+    assert set(s3.ImageCache(str(tmp_path), max_bytes=10)._entries) == {"a", "c"}
+
+
+def test_stream_survives_eviction_of_its_file(tmp_path):
+    """A response already streaming keeps its bytes when the file is evicted."""
+    cache = s3.ImageCache(str(tmp_path), max_bytes=10)
+    image = cache.put("a", iter([b"a" * 10]), None, "image/png")
+    body = s3.stream(image)
+    cache.put("b", iter([b"bbbb"]), None, "image/png")  # over budget, a goes
+
+    assert cache.get("a") is None
+    assert b"".join(body) == b"a" * 10
+
+
+def png(size: int) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 80, 40)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_thumbnail_variants_by_width_and_accept(fake_s3, monkeypatch):
+    fake_s3.objects["news-images/big.png"] = png(1024)
+    renders = []
+    real_render = thumbnails.render
+    monkeypatch.setattr(thumbnails, "render", lambda *args: renders.append(args[1:]) or real_render(*args))
+    client = TestClient(main.app)
+
+    webp = client.get("/image/big.png?w=60", headers={"Accept": "image/webp,image/*"})
+    again = client.get("/image/big.png?w=100", headers={"Accept": "image/webp,image/*"})
+    plain = client.get("/image/big.png?w=50", headers={"Accept": "image/*"})
+
+    assert webp.headers["content-type"] == "image/webp"
+    assert webp.headers["vary"] == "Accept"
+    assert Image.open(io.BytesIO(webp.content)).size == (100, 100)
+    assert again.content == webp.content
+    assert plain.headers["content-type"] == "image/png"
+    assert Image.open(io.BytesIO(plain.content)).size == (50, 50)
+    assert len(webp.content) < len(fake_s3.objects["news-images/big.png"])
+    assert renders == [(100, "webp"), (50, "png")]
+    assert fake_s3.calls == ["news-images/big.png"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_variant_misses_share_one_render(fake_s3, monkeypatch):
+    fake_s3.objects["news-images/big.png"] = png(256)
+    renders = []
+    real_render = thumbnails.render
+    monkeypatch.setattr(thumbnails, "render", lambda *args: renders.append(args[1:]) or real_render(*args))
+
+    variants = await asyncio.gather(*(thumbnails.get_variant("big.png", 100, "image/*") for _ in range(4)))
+
+    assert len({v.path for v in variants}) == 1
+    assert renders == [(100, "png")]
+
+
+def test_variant_refetches_an_original_evicted_before_rendering(fake_s3, monkeypatch):
+    fake_s3.objects["news-images/big.png"] = png(256)
+    real_render = thumbnails.render
+
+    def render(path: str, width: int, fmt: str) -> bytes:
+        if len(fake_s3.calls) == 1:
+            # Another request fills the cache while this one waits for a thread
+            cache = s3.image_cache()
+            cache.max_bytes = 0
+            cache.put("other", iter([b"x"]), None, "image/png")
+            cache.max_bytes = 10**9
+        return real_render(path, width, fmt)
+
+    monkeypatch.setattr(thumbnails, "render", render)
+    resp = TestClient(main.app).get("/image/big.png?w=100", headers={"Accept": "image/*"})
+
+    assert resp.headers["content-type"] == "image/png"
+    assert Image.open(io.BytesIO(resp.content)).size == (100, 100)
+    assert fake_s3.calls == ["news-images/big.png"] * 2
+
+
+def test_negotiate_format_prefers_avif():
+    accept = "image/avif,image/webp,*/*"
+    assert thumbnails.negotiate_format(accept, "image/png") == thumbnails.MODERN_FORMATS[0]
+    assert thumbnails.negotiate_format("*/*", "image/jpeg") == "jpeg"
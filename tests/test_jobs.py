@@ -0,0 +1,140 @@
+"""Offline tests for the scrape job queue, run against a SQLite db."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+import dashbot.jobs as jobs
+import dashbot.pipeline as pipeline
+from dashbot.scripts.database import ScrapeJob
+
+
+def test_claim_skips_overlapping_query_sets(db_sessions):
+    """A job waits while another job runs any of its queries."""
+    with db_sessions() as session:
+        first = jobs.enqueue(session, ["ai news", "tennis news"]).id
+        second = jobs.enqueue(session, ["tennis news"]).id
+        third = jobs.enqueue(session, ["python news"]).id
+    worker = jobs.Worker(db_sessions)
+
+    assert worker.claim()[0] == first
+    assert worker.claim()[0] == third
+    assert worker.claim() is None
+    with db_sessions() as session:
+        assert session.get(ScrapeJob, second).status == "queued"
+
+
+def test_claims_are_serialised_on_postgres():
+    """Workers take an advisory lock before they read the running jobs' queries."""
+    statements = []
+
+    class FakeSession:
+        def get_bind(self):
+            return SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+        def execute(self, statement, params):
+            statements.append((str(statement), params))
+
+    jobs.lock_claims(FakeSession())
+    assert statements == [("SELECT pg_advisory_xact_lock(:key)", {"key": jobs.JOB_CLAIM_LOCK})]
+
+
+@pytest.mark.asyncio
+async def test_stage_writer_saves_in_order_off_the_loop():
+    saved = []
+    writer = jobs.StageWriter(lambda stages: saved.append((stages, threading.get_ident())))
+    stages = {"search": {"status": "running"}}
+    writer(stages)
+    stages["search"]["status"] = "done"
+    writer(stages)
+    await writer.flush()
+
+    assert [s for s, _ in saved] == [{"search": {"status": "running"}}, {"search": {"status": "done"}}]
+    assert threading.get_ident() not in {t for _, t in saved}
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_jobs_and_records_stages(db_sessions, monkeypatch):
+    """The worker runs a queued job and persists per-stage progress."""
+
+    async def fake_scrape(
+        queries: dict[str, str], force: bool, progress: pipeline.Progress, run_id: str
+    ) -> dict[str, Any]:
+        with progress.stage("search") as stage:
+            stage["pages"] = len(queries)
+        if "broken" in queries:
+            raise RuntimeError("search quota exceeded")
+        return {"message": "ok", "news_feed_ids": [1]}
+
+    monkeypatch.setattr(pipeline, "scrape_news", fake_scrape)
+    with db_sessions() as session:
+        good = jobs.enqueue(session, ["ai news", "python news"]).id
+        bad = jobs.enqueue(session, ["broken"]).id
+
+    worker = jobs.Worker(db_sessions, poll_interval=0.01)
+    worker.start()
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        with db_sessions() as session:
+            statuses = {session.get(ScrapeJob, id).status for id in (good, bad)}
+        if statuses <= {"done", "failed"}:
+            break
+    await worker.stop()
+
+    with db_sessions() as session:
+        done = jobs.job_status(session.get(ScrapeJob, good))
+        failed = jobs.job_status(session.get(ScrapeJob, bad))
+    assert done["status"] == "done"
+    assert done["stages"]["search"]["status"] == "done"
+    assert done["stages"]["search"]["pages"] == 2
+    assert done["result"]["news_feed_ids"] == [1]
+    assert failed["status"] == "failed"
+    assert "search quota exceeded" in failed["error"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_is_requeued_with_its_progress(db_sessions, monkeypatch):
+    """Stopping the worker saves the last stage update and queues the job again."""
+    started = asyncio.Event()
+
+    async def fake_scrape(
+        queries: dict[str, str], force: bool, progress: pipeline.Progress, run_id: str
+    ) -> dict[str, Any]:
+        with progress.stage("search") as stage:
+            stage["pages"] = 3
+        with progress.stage("extract"):
+            started.set()
+            await asyncio.Event().wait()
+        return {}
+
+    monkeypatch.setattr(pipeline, "scrape_news", fake_scrape)
+    with db_sessions() as session:
+        job_id = jobs.enqueue(session, ["ai news"]).id
+    worker = jobs.Worker(db_sessions)
+    claimed = worker.claim()
+    task = asyncio.create_task(worker.run_job(*claimed))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    with db_sessions() as session:
+        status = jobs.job_status(session.get(ScrapeJob, job_id))
+    assert status["status"] == "queued"
+    assert (status["stages"]["search"]["status"], status["stages"]["search"]["pages"]) == ("done", 3)
+    # The update Progress made on the way out was flushed too
+    assert status["stages"]["extract"]["status"] == "failed"
+
+
+def test_progress_marks_failed_stage():
+    updates = []
+    progress = pipeline.Progress(on_update=lambda stages: updates.append(dict(stages)))
+    with pytest.raises(ValueError):
+        with progress.stage("extract"):
+            raise ValueError("boom")
+    assert progress.stages["extract"]["status"] == "failed"
+    assert "seconds" in progress.stages["extract"]
+    assert len(updates) == 2
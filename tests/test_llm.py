@@ -0,0 +1,150 @@
+"""Offline tests for the async LLM layer, using a fake backend."""
+
+import asyncio
+import time
+from typing import Any
+
+import httpx
+import pytest
+
+from dashbot.api import ai, llm
+from dashbot.api.cache import Cache
+
+
+class FakeBackend:
+    """Answers every request after `delay` seconds with a canned reply."""
+
+    def __init__(self, reply: str = "<p>summary</p>", delay: float = 0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls: list[llm.Messages] = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def complete(self, model: str, messages: llm.Messages, **params: Any) -> str:
+        self.calls.append(messages)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return self.reply
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def backend():
+    fake = FakeBackend()
+    llm.set_backend(fake)
+    yield fake
+    llm.set_backend(None)
+
+
+@pytest.mark.asyncio
+async def test_generate_summaries_run_in_parallel(backend):
+    """Summaries take about as long as the slowest call, not the sum."""
+    backend.delay = 0.2
+
+    start = time.perf_counter()
+    summaries = await ai.generate_summaries(["a", "b", "c"])
+    elapsed = time.perf_counter() - start
+
+    assert summaries == ["<p>summary</p>"] * 3
+    assert elapsed < 0.2 * 2
+    assert backend.peak == 3
+
+
+@pytest.mark.asyncio
+async def test_generate_summaries_respects_limit(backend):
+    """No more than the configured number of calls are in flight."""
+    backend.delay = 0.02
+    await llm.gather_limited([lambda: ai.generate_summary("x") for _ in range(6)], concurrency=2)
+    assert backend.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_generate_summary_strips_code_fences(backend):
+    backend.reply = "```html\n<h2>Hi</h2>\n```"
+    assert (await ai.generate_summary("context")).strip() == "<h2>Hi</h2>"
+
+
+@pytest.mark.asyncio
+async def test_generate_topics_parses_backend_reply(backend):
+    backend.reply = '[{"topic": "climate", "importance": 12, "ids": [0]}]'
+    pages = [ai.cse.GoogleCSE("https://a.example", "t", "s", "a.example", "q")]
+    topics = await ai.generate_topics(pages)
+    assert topics == [ai.Topic("climate", 10, [0])]
+
+
+@pytest.mark.asyncio
+async def test_openai_backend_retries_rate_limits():
+    """A 429 is retried after the time given in the rate-limit headers."""
+    responses = [
+        httpx.Response(429, headers={"retry-after-ms": "10"}, json={"error": {"message": "slow down"}}),
+        httpx.Response(
+            200,
+            json={
+                "id": "1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hello"}}
+                ],
+            },
+        ),
+    ]
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses.pop(0)
+
+    fake_server = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    llm.set_backend(llm.OpenAIBackend(api_key="test", base_url="http://fake/v1", http_client=fake_server))
+    try:
+        reply = await llm.chat([{"role": "user", "content": "hi"}], backoff=0.01)
+    finally:
+        await llm.close()
+
+    assert reply == "hello"
+    assert len(requests) == 2
+    assert str(requests[0].url) == "http://fake/v1/chat/completions"
+
+
+def test_parse_rate_limit_durations():
+    assert llm._parse_duration("20ms") == pytest.approx(0.02)
+    assert llm._parse_duration("6m0s") == 360
+    assert llm._parse_duration("1.5s") == 1.5
+    assert llm._parse_duration("soon") is None
+
+
+@pytest.mark.asyncio
+async def test_caching_backend_reuses_identical_requests(tmp_path):
+    """Identical (model, messages, params) are answered from the cache."""
+    fake = FakeBackend(reply="cached")
+    cache = Cache("llm", ttl=60, path=str(tmp_path / "llm.sqlite3"))
+    backend = llm.CachingBackend(fake, cache)
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert await backend.complete("m", messages) == "cached"
+    assert await backend.complete("m", messages) == "cached"
+    await backend.complete("m", messages, temperature=0)
+
+    assert len(fake.calls) == 2
+    assert cache.stats.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay(tmp_path):
+    """A recorded run can be replayed offline, unknown requests fail loudly."""
+    path = str(tmp_path / "replay.jsonl")
+    messages = [{"role": "user", "content": "summarise"}]
+    recorder = llm.RecordingBackend(FakeBackend(reply="recorded"), path)
+    await recorder.complete("m", messages)
+
+    replay = llm.ReplayBackend(path)
+    assert await replay.complete("m", messages) == "recorded"
+    with pytest.raises(LookupError):
+        await replay.complete("m", [{"role": "user", "content": "other"}])
@@ -0,0 +1,91 @@
+"""Offline tests for schema migrations and the feed query plan, on SQLite."""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from dashbot import feed
+from dashbot.scripts import migrations
+from dashbot.scripts.database import Base, NewsFeed
+
+
+def test_migrate_fresh_database_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}")
+    assert migrations.migrate(engine) == [m.version for m in migrations.MIGRATIONS]
+    assert migrations.migrate(engine) == []
+
+    names = {i["name"] for i in inspect(engine).get_indexes("news_feed")}
+    assert {"ix_news_feed_live", "ix_news_feed_liked", "ix_news_feed_score"} <= names
+
+
+def test_migrations_build_every_model_table(tmp_path):
+    """A model table or column without a migration shows up here."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}")
+    migrations.migrate(engine)
+    schema = inspect(engine)
+
+    for table in Base.metadata.sorted_tables:
+        columns = {c["name"]: c["nullable"] for c in schema.get_columns(table.name)}
+        assert columns == {c.name: c.nullable for c in table.columns}, table.name
+
+
+def test_migrate_keeps_rows_of_legacy_schema():
+    """A table from the old create_all gets the new column and indexes."""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE news_feed (id INTEGER PRIMARY KEY, title VARCHAR, content VARCHAR, "
+            "source VARCHAR, image VARCHAR, score INTEGER, feedback VARCHAR, "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, deleted_at TIMESTAMP)"
+        ))
+        conn.execute(text("INSERT INTO news_feed (title, content, source, image) VALUES ('t', 'c', 's', 'i')"))
+
+    migrations.migrate(engine)
+
+    with Session(engine) as session:
+        item = session.query(NewsFeed).one()
+        assert item.title == "t"
+        assert item.is_liked is False
+
+
+def test_migrated_updated_at_has_the_fresh_default():
+    """updated_at added by migration defaults to now, as in a fresh schema."""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE news_feed (id INTEGER PRIMARY KEY, title VARCHAR, content VARCHAR, "
+            "source VARCHAR, image VARCHAR, score INTEGER, feedback VARCHAR, "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, deleted_at TIMESTAMP)"
+        ))
+
+    migrations.migrate(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO news_feed (title, content, source, image) VALUES ('t', 'c', 's', 'i')"))
+        assert conn.execute(text("SELECT updated_at FROM news_feed")).scalar() is not None
+
+
+def query_plan(session: Session, cursor: str | None) -> str:
+    """EXPLAIN QUERY PLAN of the statement feed_page sends."""
+    statement = feed.feed_query(cursor, 11).compile(session.bind, compile_kwargs={"literal_binds": True})
+    rows = session.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_feed_pages_use_the_partial_index():
+    """Both the first and later pages walk the index instead of sorting."""
+    engine = create_engine("sqlite://")
+    migrations.migrate(engine)
+    with Session(engine) as session:
+        session.add_all(
+            NewsFeed(title=f"t{i}", content="c", source="s", image="i", created_at=datetime(2025, 9, 1 + i % 28))
+            for i in range(200)
+        )
+        session.commit()
+        session.execute(text("ANALYZE"))
+        cursor = feed.feed_page(session, limit=10).next_cursor
+
+        for plan in (query_plan(session, None), query_plan(session, cursor)):
+            assert "ix_news_feed_live" in plan
+            assert "TEMP B-TREE" not in plan
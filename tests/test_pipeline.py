@@ -0,0 +1,125 @@
+"""Offline tests for checkpointed pipeline stages, using SQLite."""
+
+import threading
+from typing import Any
+
+import pytest
+
+import dashbot.api.context as context_builder
+import dashbot.api.dedup as dedup
+import dashbot.pipeline as pipeline
+import dashbot.store as store
+from dashbot.api import ai, cse
+
+PAGES = [
+    cse.GoogleCSE("https://a.example/1", "Election in Bavaria", "CSU wins", "a.example", "german news"),
+    cse.GoogleCSE("https://b.example/2", "US Open final", "Alcaraz wins", "b.example", "tennis news"),
+]
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch, db_sessions):
+    """Replace every network call and the news store and count how often each runs."""
+    monkeypatch.setattr(pipeline, "SessionLocal", db_sessions)
+    calls: dict[str, Any] = {"search": 0, "topics": 0, "extract": 0, "summaries": [], "stored": []}
+
+    async def search_stage(queries: dict[str, str], force: bool) -> list[cse.GoogleCSE]:
+        calls["search"] += 1
+        return PAGES
+
+    async def topics_stage(pages: list[cse.GoogleCSE]) -> list[ai.Topic]:
+        calls["topics"] += 1
+        return [ai.Topic("bavaria", 8, [0]), ai.Topic("tennis", 5, [1])]
+
+    async def extract_articles(pages: list[cse.GoogleCSE]) -> list[cse.WebArticle | None]:
+        calls["extract"] += 1
+        return [cse.WebArticle([], f"text of {p.title}", p.source, None, p) for p in pages]
+
+    async def generate_summaries(contexts: list[str]) -> list[str | None]:
+        calls["summaries"].append(len(contexts))
+        return [f"<p>{c[:10]}</p>" for c in contexts]
+
+    def store_news(items: list[store.NewsItem], run_id: str) -> dict[str, int]:
+        if calls.get("fail_on") in [item.title for item in items]:
+            raise RuntimeError("database went away")
+        calls["stored"].append([item.title for item in items])
+        return {item.title: i + 1 for i, item in enumerate(items)}
+
+    monkeypatch.setattr(pipeline, "search_stage", search_stage)
+    monkeypatch.setattr(pipeline, "topics_stage", topics_stage)
+    monkeypatch.setattr(cse, "extract_articles", extract_articles)
+    monkeypatch.setattr(ai, "generate_summaries", generate_summaries)
+    monkeypatch.setattr(store, "store_news", store_news)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_stages(fake_pipeline):
+    """A run that failed while storing resumes without repeating earlier work."""
+    fake_pipeline["fail_on"] = "tennis"
+    with pytest.raises(RuntimeError):
+        await pipeline.scrape_news(run_id="run-1")
+    assert fake_pipeline["stored"] == []
+
+    fake_pipeline["fail_on"] = None
+    progress = pipeline.Progress()
+    result = await pipeline.scrape_news(progress=progress, run_id="run-1")
+
+    assert fake_pipeline["search"] == 1
+    assert fake_pipeline["topics"] == 1
+    assert fake_pipeline["extract"] == 1
+    assert fake_pipeline["summaries"] == [2]
+    assert fake_pipeline["stored"] == [["bavaria", "tennis"]]
+    assert result["news_feed_ids"] == [1, 2]
+    assert progress.stages["extract"]["resumed"] is True
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_cleared_after_success(fake_pipeline):
+    await pipeline.scrape_news(run_id="run-2")
+    assert await pipeline.Checkpoints("run-2").load("search") is None
+
+
+@pytest.mark.asyncio
+async def test_without_run_id_nothing_is_stored(fake_pipeline):
+    await pipeline.scrape_news()
+    await pipeline.scrape_news()
+    assert fake_pipeline["search"] == 2
+
+
+
+def record_thread(threads: dict[str, int], name: str, fn):
+    def run(*args, **kwargs):
+        threads[name] = threading.get_ident()
+        return fn(*args, **kwargs)
+
+    return run
+
+
+@pytest.mark.asyncio
+async def test_contexts_are_built_off_the_loop(fake_pipeline, monkeypatch):
+    """Tokenising the articles does not block the loop the web app shares."""
+    threads: dict[str, int] = {}
+    monkeypatch.setattr(
+        context_builder, "build_context", record_thread(threads, "context", context_builder.build_context)
+    )
+
+    await pipeline.scrape_news()
+
+    assert threads["context"] != threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_search_stage_dedupes_off_the_loop(monkeypatch):
+    threads: dict[str, int] = {}
+
+    async def search_google(query: str) -> list[cse.GoogleCSE]:
+        return [p for p in PAGES if p.query == query]
+
+    monkeypatch.setattr(cse, "search_google", search_google)
+    monkeypatch.setattr(dedup, "dedupe_pages", record_thread(threads, "dedup", dedup.dedupe_pages))
+
+    pages = await pipeline.search_stage({"german news": "", "tennis news": ""}, force=True)
+
+    assert pages == PAGES
+    assert threads["dedup"] != threading.get_ident()
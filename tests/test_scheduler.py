@@ -0,0 +1,117 @@
+"""Offline tests for the per-host fetch scheduler."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from dashbot.api import http_client
+from dashbot.api import scheduler as scheduler_module
+from dashbot.api.scheduler import FetchDisallowed, Scheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake monotonic clock that asyncio.sleep advances."""
+    now = [1000.0]
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(scheduler_module.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(scheduler_module.asyncio, "sleep", sleep)
+    return sleeps
+
+
+@pytest.mark.asyncio
+async def test_acquire_paces_each_host_after_burst(clock):
+    """A host gets `burst` requests at once, then one per 1/rate seconds."""
+    s = Scheduler(rate=2, burst=2)
+    waits = [await s.acquire("https://a.example/x") for _ in range(4)]
+    assert waits == [0.0, 0.0, 0.5, 0.5]
+    # Other hosts have their own bucket
+    assert await s.acquire("https://b.example/x") == 0.0
+    assert s.stats()["requests"] == 5
+    assert s.stats()["max_wait"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_cancelled_acquire_gives_its_slot_back():
+    """A request cancelled while waiting does not push later ones back."""
+    s = Scheduler(rate=5, burst=1)
+    await s.acquire("a.example")
+    tat = s.hosts["a.example"].tat
+    waiting = asyncio.create_task(s.acquire("a.example"))
+    await asyncio.sleep(0.01)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert s.hosts["a.example"].tat == tat
+    assert s.stats()["requests"] == 1
+    assert await s.acquire("a.example") == pytest.approx(0.2, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_acquire_keeps_later_bookings():
+    """A slot booked after the cancelled one is not handed out twice."""
+    s = Scheduler(rate=5, burst=1)
+    await s.acquire("a.example")
+    cancelled = asyncio.create_task(s.acquire("a.example"))
+    await asyncio.sleep(0.01)
+    booked = asyncio.create_task(s.acquire("a.example"))
+    await asyncio.sleep(0.01)
+    tat = s.hosts["a.example"].tat
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+    assert s.hosts["a.example"].tat == tat
+    booked.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await booked
+
+
+@pytest.mark.asyncio
+async def test_throttle_backs_off_and_recovers(clock):
+    """429/503 pause the host, honouring Retry-After; successes undo it."""
+    s = Scheduler(rate=10, burst=1)
+    await s.acquire("a.example")
+    s.feedback("a.example", 429, retry_after=3)
+    assert await s.acquire("a.example") == pytest.approx(3)
+    assert s.stats()["throttled"] == 1
+    assert s.hosts["a.example"].backoff_level == 1
+    s.feedback("a.example", 200)
+    assert s.hosts["a.example"].backoff_level == 0
+
+
+@pytest.mark.asyncio
+async def test_robots_disallow_and_crawl_delay():
+    """robots.txt is fetched once per host; Crawl-delay slows the host down."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text="User-agent: *\nCrawl-delay: 5\nDisallow: /private\n")
+        return httpx.Response(200, text="ok")
+
+    await http_client.start(transport=httpx.MockTransport(handler))
+    try:
+        resp = await http_client.request("GET", "https://news.example/story", robots=True)
+        with pytest.raises(FetchDisallowed):
+            await http_client.request("GET", "https://news.example/private/a", robots=True)
+    finally:
+        await http_client.close()
+
+    assert resp.status_code == 200
+    assert calls == ["/robots.txt", "/story"]
+    assert scheduler_module.scheduler.hosts["news.example"].interval == 5
+
+
+@pytest.mark.asyncio
+async def test_missing_robots_allows_everything():
+    async with httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(404))) as client:
+        assert await Scheduler().allowed("https://news.example/anything", client)
@@ -0,0 +1,42 @@
+"""Offline tests for the seen-url index, run against a SQLite db."""
+
+from sqlalchemy import select
+
+from dashbot import store
+from dashbot.api import seen
+from dashbot.api.cse import GoogleCSE
+from dashbot.scripts.database import SeenUrl
+
+
+def make_page(url: str) -> GoogleCSE:
+    return GoogleCSE(url=url, title="title", snippet="snippet", source="source", query="q")
+
+
+def make_item(title: str, urls: list[str]) -> store.NewsItem:
+    return store.NewsItem(title=title, content="c", source="s", image="i", urls=urls)
+
+
+def test_filter_unseen_skips_summarised_urls(db_sessions):
+    """Pages summarised in an earlier run are filtered, tracking params aside."""
+    sessions = db_sessions
+    store.store_news(
+        [make_item("t", ["https://www.example.com/story?utm_source=x"])], run_id="r1", session_factory=sessions
+    )
+
+    pages = [make_page("https://example.com/story"), make_page("https://example.com/new")]
+    with sessions() as session:
+        assert seen.filter_unseen(session, pages) == [pages[1]]
+
+
+def test_store_news_repoints_seen_urls(db_sessions):
+    """A forced refresh links already seen urls to the newest item."""
+    sessions = db_sessions
+    first = store.store_news([make_item("t1", ["https://example.com/a"])], run_id="r1", session_factory=sessions)
+    second = store.store_news(
+        [make_item("t2", ["https://example.com/a", "https://example.com/b"])], run_id="r2", session_factory=sessions
+    )
+
+    with sessions() as session:
+        rows = dict(session.execute(select(SeenUrl.url, SeenUrl.news_feed_id)).all())
+    assert first["t1"] != second["t2"]
+    assert rows == {"https://example.com/a": second["t2"], "https://example.com/b": second["t2"]}
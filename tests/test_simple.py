@@ -1,13 +1,14 @@
 """Simple tests that call real APIs with minimal test data."""
 
 import pytest
-from dashbot.api import cse
+from dashbot.api import cse, http_client
 from dashbot.api.ai import generate_topics, personalize_topics, get_pages_per_topic, generate_summary
 from dashbot.api.cse import extract_article, GoogleCSE, search_google
 import asyncio
 
 
-def test_generate_topics():
+@pytest.mark.asyncio
+async def test_generate_topics():
     """Test AI topic generation with real OpenAI API."""
     # Simple test data - just a few pages
     pages = [
@@ -25,7 +26,7 @@ def test_generate_topics():
         )
     ]
     
-    topics = generate_topics(pages)
+    topics = await generate_topics(pages)
     
     # Just check it returns something reasonable
     assert len(topics) > 0
@@ -98,7 +99,8 @@ def test_extract_article():
     print(f"Extracted article content: {article.content}")
 
 
-def test_generate_summary():
+@pytest.mark.asyncio
+async def test_generate_summary():
     """Test AI summary generation with real OpenAI API."""
     # Simple test context
     context = """
@@ -107,7 +109,7 @@ def test_generate_summary():
     Governments are implementing new climate policies. The Paris Agreement targets are being reviewed.
     """
     
-    summary = generate_summary(context)
+    summary = await generate_summary(context)
     
     assert summary is not None
     assert len(summary) > 0
@@ -117,7 +119,8 @@ def test_generate_summary():
 @pytest.mark.asyncio
 async def test_search_google():
     """Test search google with real Google Custom Search API."""
-    pages = await cse.search_google("climate change")
+    async with http_client.session():
+        pages = await cse.search_google("climate change")
     assert len(pages) > 0
     print(f"Searched for 'climate change' and found {len(pages)} pages")
     for id, page in enumerate(pages):
@@ -146,9 +149,9 @@ def test_extract_article1():
 if __name__ == "__main__":
     # Run tests individually
     asyncio.run(test_search_google())
-    test_generate_topics()
+    asyncio.run(test_generate_topics())
     test_personalize_topics() 
     test_get_pages_per_topic()
     test_extract_article()
-    test_generate_summary()
+    asyncio.run(test_generate_summary())
     test_search_google()
@@ -0,0 +1,56 @@
+"""Import-time budget for the web app and the job worker, measured with python -X importtime."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Scraper and storage libraries the web app only loads when they are used
+SCRAPER_MODULES = {"openai", "newspaper", "googleapiclient", "boto3", "botocore", "PIL", "dashbot.pipeline"}
+DRIVER_MODULES = {"psycopg2", "asyncpg"}
+# Not needed by the scraper either: search goes through the shared http
+# client, and S3 is only read by the image endpoint
+SCRAPER_UNUSED_MODULES = {"googleapiclient", "boto3", "botocore"}
+
+# Generous for slow CI machines; loading the scraper eagerly costs about as much again
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds per module loaded by `import module`."""
+    # No database settings: they are only checked when a connection is made
+    env = {k: v for k, v in os.environ.items() if not k.startswith("DB_")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ["dashbot.main", "dashbot.jobs"])
+def test_startup_skips_scraper_and_drivers(module):
+    loaded = set(import_times(module))
+    assert not loaded & (SCRAPER_MODULES | DRIVER_MODULES)
+
+
+@pytest.mark.parametrize("module", ["dashbot.pipeline", "dashbot.api.cse"])
+def test_scraper_skips_unused_clients_and_drivers(module):
+    loaded = set(import_times(module))
+    assert module in loaded
+    assert not loaded & (SCRAPER_UNUSED_MODULES | DRIVER_MODULES)
+
+
+def test_web_app_import_time_budget():
+    times = import_times("dashbot.main")
+    assert times["dashbot.main"] / 1000 < IMPORT_TIME_BUDGET_MS
@@ -0,0 +1,44 @@
+"""Offline tests for batched news persistence, run against a SQLite db."""
+
+from sqlalchemy import event, func, select
+
+from dashbot import feed, store
+from dashbot.scripts.database import ContextRules, NewsFeed, SeenUrl
+
+
+def items(content: str) -> list[store.NewsItem]:
+    return [
+        store.NewsItem("bavaria", content, "a.example", "b.png", ["https://a.example/1?utm_source=x"]),
+        store.NewsItem("tennis", content, "b.example", "t.png", ["https://b.example/2"]),
+    ]
+
+
+def test_run_is_stored_in_one_transaction(db_engine, db_sessions):
+    factory = db_sessions
+    commits = []
+    event.listen(db_engine, "commit", lambda conn: commits.append(1))
+    version = feed.fragment_cache.version
+
+    ids = store.store_news(items("<p>v1</p>"), run_id="run-1", rules=[ContextRules(rule="less sport")], session_factory=factory)
+
+    assert set(ids) == {"bavaria", "tennis"}
+    assert len(commits) == 1
+    assert feed.fragment_cache.version == version + 1
+    with factory() as session:
+        assert session.scalar(select(func.count()).select_from(ContextRules)) == 1
+        seen = dict(session.execute(select(SeenUrl.url, SeenUrl.news_feed_id)).all())
+    assert seen == {"https://a.example/1": ids["bavaria"], "https://b.example/2": ids["tennis"]}
+
+
+def test_same_run_is_upserted_not_duplicated(db_sessions):
+    factory = db_sessions
+    first = store.store_news(items("<p>v1</p>"), run_id="run-1", session_factory=factory)
+    second = store.store_news(items("<p>v2</p>"), run_id="run-1", session_factory=factory)
+    other = store.store_news(items("<p>v3</p>"), run_id="run-2", session_factory=factory)
+
+    assert first == second
+    assert set(other.values()).isdisjoint(first.values())
+    with factory() as session:
+        rows = session.execute(select(NewsFeed.run_id, NewsFeed.title, NewsFeed.content)).all()
+    assert len(rows) == 4
+    assert ("run-1", "bavaria", "<p>v2</p>") in rows